@@ -0,0 +1,120 @@
+# batch_mode.py (offline recommendations over a JSONL query file)
+import json
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from worker_pool import AssistantPool
+
+
+def iter_queries(path, offset=0):
+    """
+    Streams (line_no, record) from a JSONL file without loading it.
+    Each record: {"text": "...", "image_path": "...optional...", "user_id": "...optional...", "id": ...}
+    Lines before `offset` are skipped (resume support).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if line_no < offset:
+                continue
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                logging.warning("[BATCH] Skipping invalid JSON on line %s", line_no)
+                continue
+            if isinstance(rec, str):
+                rec = {"text": rec}
+            yield line_no, rec
+
+
+def run_batch(in_path, out_path, workers=None, ordered=True, offset=0, window=None,
+              vision_workers=1):
+    """
+    Processes every query in `in_path` on a worker pool and streams one
+    write_ui_output-style payload per line to `out_path`.
+
+    - workers : text worker processes (default: all cores)
+    - vision_workers : processes that load BLIP for image queries
+    - ordered : keep input order in the output (else completion order)
+    - offset  : input line to resume from; output is appended
+    - window  : max queries in flight + buffered (bounds memory)
+
+    Returns the number of results written.
+    """
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 4
+    mode = "a" if offset else "w"
+
+    queries = iter_queries(in_path, offset=offset)
+    pending = {}      # future → (line_no, record)
+    done_buf = {}     # line_no → payload (ordered mode only)
+    order = []        # submitted line numbers not yet written (ordered mode)
+    written = 0
+
+    logging.info("[BATCH] %s → %s (workers=%s, ordered=%s, offset=%s)",
+                 in_path, out_path, workers, ordered, offset)
+
+    with open(out_path, mode, encoding="utf-8") as out, \
+            AssistantPool(text_workers=workers, vision_workers=vision_workers) as pool:
+
+        def emit(payload):
+            out.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+        exhausted = False
+        while pending or not exhausted:
+            # ------------------------------------------
+            # Refill up to the window
+            # ------------------------------------------
+            while not exhausted and len(pending) + len(done_buf) < window:
+                nxt = next(queries, None)
+                if nxt is None:
+                    exhausted = True
+                    break
+                line_no, rec = nxt
+                text = (rec.get("text") or rec.get("query") or "").strip()
+                image_path = rec.get("image_path") or rec.get("image")
+                pending[pool.submit(text, image_path=image_path,
+                                    user_id=rec.get("user_id"))] = (line_no, rec)
+                if ordered:
+                    order.append(line_no)
+
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                line_no, rec = pending.pop(fut)
+                try:
+                    payload = fut.result()
+                except Exception:
+                    logging.exception("[BATCH] Query on line %s failed", line_no)
+                    payload = {"error": "processing_failed", "results": []}
+
+                payload["line"] = line_no
+                if "id" in rec:
+                    payload["query_id"] = rec["id"]
+
+                if ordered:
+                    done_buf[line_no] = payload
+                else:
+                    emit(payload)
+                    written += 1
+
+            # ------------------------------------------
+            # Ordered mode: flush the contiguous head
+            # ------------------------------------------
+            if ordered:
+                head = 0
+                while head < len(order) and order[head] in done_buf:
+                    emit(done_buf.pop(order[head]))
+                    written += 1
+                    head += 1
+                del order[:head]
+
+            out.flush()
+
+    logging.info("[BATCH] Wrote %s results to %s", written, out_path)
+    return written
@@ -1,5 +1,42 @@
 import re
 import logging
+from typing import NamedTuple, Optional
+
+
+class PriceRange(NamedTuple):
+    """
+    Structured price constraint.
+    - low / high: inclusive bounds, None = open
+    - hard: filter on it (search); soft ("around 2000") only ranks
+    Products without a price always pass (same as the old filter).
+    """
+    low: Optional[float] = None
+    high: Optional[float] = None
+    hard: bool = True
+
+    def contains(self, price):
+        if not price:
+            return True
+        return (self.low is None or price >= self.low) and (self.high is None or price <= self.high)
+
+    def __str__(self):
+        if self.low is not None and self.high is not None:
+            if not self.hard:
+                return f"around ₹{(self.low + self.high) / 2:g}"
+            return f"₹{self.low:g}–₹{self.high:g}"
+        if self.high is not None:
+            return f"under ₹{self.high:g}"
+        if self.low is not None:
+            return f"above ₹{self.low:g}"
+        return "any price"
+
+
+def as_range(budget):
+    """PriceRange from a PriceRange or a plain max price (None → None)."""
+    if budget is None or isinstance(budget, PriceRange):
+        return budget
+    return PriceRange(high=budget)
+
 
 class BudgetAgent:
     """
@@ -9,13 +46,42 @@ class BudgetAgent:
     - Ranges: 500-1500, 700 to 1200
     - Spoken formats: '2k', '5 thousand'
     - Keywords: cheap, affordable, low budget
+    - Lower bounds: above / over / more than / at least
+    - Soft targets: around / about / approx (±20%, ranking only)
+    extract() returns a PriceRange (or None); split() also returns the
+    text with the matched budget phrase cut out.
     """
 
+    SOFT_WORDS = ("around", "about", "approx", "approximately", "roughly")
+    LOWER_WORDS = ("above", "over", "more than", "at least", "starting", "min")
+
+    def _bound(self, t, val, token):
+        """Wraps one amount as an upper, lower or soft bound by the word before it."""
+        num = re.escape(token)
+        for w in self.SOFT_WORDS:
+            if re.search(rf"\b{w}\b\D{{0,6}}{num}", t):
+                return PriceRange(round(val * 0.8), round(val * 1.2), hard=False)
+        for w in self.LOWER_WORDS:
+            if re.search(rf"\b{w}\b\D{{0,6}}{num}", t):
+                return PriceRange(low=val)
+        return PriceRange(high=val)
+
     def extract(self, text):
+        return self.split(text)[0]
+
+    def split(self, text):
+        """(PriceRange or None, lower-cased text without the budget phrase)."""
         if not text:
-            return None
+            return None, ""
 
         t = text.lower().strip()
+        budget, span = self._match(t)
+        if span is None:
+            return budget, t
+        return budget, t[:span[0]] + " " + t[span[1]:]
+
+    def _match(self, t):
+        """(PriceRange or None, (start, end) of the phrase it was read from)."""
 
         # -----------------------------------------
         # 1) RANGE extraction
@@ -23,10 +89,9 @@ class BudgetAgent:
         # e.g.: "500-1500", "600 to 1200", "700 upto 900"
         range_match = re.search(r"(\d+)\s*(?:-|to|upto|–|—)\s*(\d+)", t)
         if range_match:
-            low, high = map(int, range_match.groups())
-            est = (low + high) // 2
-            logging.info(f"[BUDGET] Range {low}-{high} → Estimated {est}")
-            return est
+            low, high = sorted(map(int, range_match.groups()))
+            logging.info(f"[BUDGET] Range {low}-{high}")
+            return PriceRange(low, high), range_match.span()
 
         # -----------------------------------------
         # 2) K / Thousand formats
@@ -37,7 +102,7 @@ class BudgetAgent:
             num = float(k_match.group(1))
             val = int(num * 1000)
             logging.info(f"[BUDGET] Converted K/thousand: {num}k → {val}")
-            return val
+            return self._bound(t, val, k_match.group(1)), k_match.span()
 
         # -----------------------------------------
         # 3) Currency formats
@@ -47,7 +112,7 @@ class BudgetAgent:
         if currency_match:
             val = int(currency_match.group(2))
             logging.info(f"[BUDGET] Currency detected → {val}")
-            return val
+            return self._bound(t, val, currency_match.group(2)), currency_match.span()
 
         # -----------------------------------------
         # 4) Standalone digits
@@ -64,7 +129,8 @@ class BudgetAgent:
                 logging.info(f"[BUDGET] Ignored small number {num}")
             else:
                 logging.info(f"[BUDGET] Extracted standalone number → {num}")
-                return num
+                span = re.search(rf"(?<!\d){num}(?!\d)", t).span()
+                return self._bound(t, num, str(num)), span
 
         # -----------------------------------------
         # 5) Keyword-based fallback
@@ -72,6 +138,6 @@ class BudgetAgent:
         cheap_words = ["cheap", "affordable", "low budget", "budget", "underbudget"]
         if any(w in t for w in cheap_words):
             logging.info("[BUDGET] Keyword fallback → 1000")
-            return 1000
+            return PriceRange(high=1000), None
 
-        return None
+        return None, None
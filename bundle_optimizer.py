@@ -0,0 +1,112 @@
+# agents/bundle_optimizer.py (budget-constrained multi-item bundles: knapsack DP)
+import logging
+import math
+import time
+
+import numpy as np
+
+from agents.budget_agent import as_range
+from agents.outfit_score_agent import OutfitScoreAgent
+
+
+class BundleOptimizer:
+    """
+    Picks the best-scoring set of items whose TOTAL price fits a budget.
+    - candidates: top search results for the EventAgent / GiftAgent
+      templates, valued with OutfitScoreAgent.score_batch
+    - prices bucketed to `bucket` rupees (rounded up → never over budget)
+    - multiple-choice 0/1 knapsack DP: at most one item per category,
+      at most `max_items` items; state = (items used, budget buckets)
+    - anytime: a greedy bundle is ready immediately; the DP stops at
+      `time_limit_ms` and returns the best bundle found so far
+    """
+
+    def __init__(self, scorer=None, bucket=50, max_items=4, max_candidates=60, time_limit_ms=25):
+        self.scorer = scorer or OutfitScoreAgent()
+        self.bucket = bucket
+        self.max_items = max_items
+        self.max_candidates = max_candidates
+        self.time_limit_ms = time_limit_ms
+
+    def _greedy(self, items, values, weights, cap):
+        chosen, used, cats = [], 0, set()
+        for i in np.argsort(-values / np.maximum(weights, 1), kind="stable"):
+            cat = items[i].get("category")
+            if cat in cats or used + weights[i] > cap or len(chosen) >= self.max_items:
+                continue
+            chosen.append(int(i))
+            used += weights[i]
+            cats.add(cat)
+        return chosen
+
+    def best_bundle(self, candidates, budget, analysis=None, event=None):
+        """{"items", "total_price", "score"} or None when nothing fits."""
+        budget = as_range(budget).high if budget else None   # total cap
+        if not budget:
+            return None
+
+        items = [p for p in candidates if (p.get("price") or 0) > 0 and p["price"] <= budget]
+        items = items[:self.max_candidates]
+        if not items:
+            return None
+
+        values = self.scorer.score_batch(items, analysis or {}, event=event).astype(np.float64)
+        weights = np.array([math.ceil(p["price"] / self.bucket) for p in items], dtype=np.int64)
+        cap = int(budget // self.bucket)
+        k = self.max_items
+
+        best = self._greedy(items, values, weights, cap)
+
+        # group by category (one item per group)
+        groups = {}
+        for i, p in enumerate(items):
+            groups.setdefault(p.get("category"), []).append(i)
+
+        # dp[j, c] = best value using j items and c buckets
+        dp = np.full((k + 1, cap + 1), -np.inf)
+        dp[0, 0] = 0.0
+        choices = []
+        deadline = time.perf_counter() + self.time_limit_ms / 1000.0
+        finished = True
+
+        for members in groups.values():
+            new = dp.copy()
+            pick = np.full(dp.shape, -1, dtype=np.int64)
+            for i in members:
+                w = weights[i]
+                if w > cap:
+                    continue
+                cand = np.full(dp.shape, -np.inf)
+                cand[1:, w:] = dp[:-1, :cap + 1 - w] + values[i]
+                better = cand > new
+                new[better] = cand[better]
+                pick[better] = i
+            dp = new
+            choices.append(pick)
+            if time.perf_counter() > deadline:
+                finished = False
+                break
+
+        # backtrack from the best reachable state
+        j, c = np.unravel_index(np.argmax(dp), dp.shape)
+        chosen = []
+        for pick in reversed(choices):
+            i = pick[j, c]
+            if i >= 0:
+                chosen.append(int(i))
+                j, c = j - 1, c - weights[i]
+
+        if values[chosen].sum() >= values[best].sum():
+            best = chosen[::-1]
+        if not finished:
+            logging.info("[BUNDLE] Time limit hit after %s/%s groups → best so far",
+                         len(choices), len(groups))
+
+        if not best:
+            return None
+        bundle = [items[i] for i in best]
+        return {
+            "items": bundle,
+            "total_price": sum(p["price"] for p in bundle),
+            "score": round(float(values[best].sum()), 2),
+        }
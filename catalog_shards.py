@@ -0,0 +1,253 @@
+# agents/catalog_shards.py (sharded catalog: one worker process per shard, scatter-gather)
+import argparse
+import heapq
+import json
+import logging
+import multiprocessing as mp
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from agents.facet_index import _values
+from agents.product_recommender_agent import ProductRecommenderAgent
+from agents.product_search_agent import ProductSearchAgent
+from agents.spell_index import SpellIndex
+
+MANIFEST = "manifest.json"
+
+
+def shard_of(product, n_shards, by="hash"):
+    """Stable shard number: crc32 of the product id, or of its (first) category."""
+    if by == "category":
+        cats = _values(product, "category")
+        key = cats[0] if cats else ""
+    else:
+        key = str(product.get("id"))
+    return zlib.crc32(key.encode("utf-8")) % n_shards
+
+
+def iter_products(path):
+    """Products from a JSON list, or streamed line by line from JSONL."""
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def write_shards(products, out_dir, n_shards, by="hash"):
+    """
+    Splits a product stream into shard-<i>.jsonl files of [position, product]
+    lines (position = index in the full catalog, the final tie-break) and
+    a manifest with the category → shards map for category routing.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    files = [open(os.path.join(out_dir, f"shard-{i:03d}.jsonl"), "w", encoding="utf-8")
+             for i in range(n_shards)]
+    sizes = [0] * n_shards
+    categories = {}
+    try:
+        for pos, p in enumerate(products):
+            i = shard_of(p, n_shards, by)
+            files[i].write(json.dumps([pos, p], ensure_ascii=False) + "\n")
+            sizes[i] += 1
+            for c in _values(p, "category"):
+                categories.setdefault(c, set()).add(i)
+    finally:
+        for f in files:
+            f.close()
+
+    with open(os.path.join(out_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({
+            "shards": n_shards,
+            "by": by,
+            "count": sum(sizes),
+            "sizes": sizes,
+            "categories": {c: sorted(s) for c, s in categories.items()},
+        }, f)
+    return sizes
+
+
+# ----------------------------------------------------------
+# Shard worker (one process per shard)
+# ----------------------------------------------------------
+def _serve(path, conn):
+    logging.getLogger().setLevel(logging.WARNING)
+
+    positions, products = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            pos, p = json.loads(line)
+            positions.append(pos)
+            products.append(p)
+
+    search = ProductSearchAgent(products)
+    reco = ProductRecommenderAgent(products)
+    global_pos = {id(p): pos for pos, p in zip(positions, products)}
+    # token → (count, first catalog position): the coordinator rebuilds the
+    # spelling vocabulary in the same insertion order as one big index
+    conn.send(("ready", {t: (len(pos), positions[pos[0]])
+                         for t, pos in search.facets.postings.items()}))
+
+    while True:
+        op, args = conn.recv()
+        if op == "stop":
+            break
+        try:
+            if op == "spell":
+                # corrections must come from the whole catalog's vocabulary
+                search.spell = SpellIndex.from_counts(args)
+                reply = None
+            elif op == "search":
+                kwargs, k = args
+                keyed = search.search(keyed=True, **kwargs)[:k]
+                reply = [((key, global_pos[id(p)]), p) for key, p in keyed]
+            elif op == "rank":
+                kwargs, context, k = args
+                keyed = search.search(keyed=True, **kwargs)
+                cands = [p for _, p in keyed]
+                s = reco.scores(cands, context)
+                order = np.argsort(-s, kind="stable")[:k]
+                reply = [((-int(s[i]), keyed[i][0], global_pos[id(cands[i])]), cands[i])
+                         for i in order]
+            else:
+                raise ValueError(f"unknown op {op!r}")
+            conn.send(("ok", reply))
+        except Exception as e:
+            logging.exception("[SHARDS] %s failed in %s", op, path)
+            conn.send(("error", repr(e)))
+    conn.close()
+
+
+class ShardedCatalog:
+    """
+    Coordinator over catalog shards written by write_shards().
+    - each shard is loaded by its own worker process, which holds the
+      shard's ProductSearchAgent + ProductRecommenderAgent; the
+      coordinator holds no products
+    - queries are scattered to every shard (only the shards holding a
+      `category` when sharded by category) and each returns its top-k
+      with sort keys
+    - a k-way heapq.merge on (search key, catalog position) gives exactly
+      the single-process order; ranked queries merge on (-score, search
+      key, position), i.e. ProductRecommenderAgent.rank over search()
+    - spelling correction uses the summed vocabulary of all shards
+    Keyword path only: shards don't load an embedding index.
+    """
+
+    def __init__(self, path, start=True):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.n = self.manifest["shards"]
+        self._lock = threading.Lock()
+        self._procs = []
+        self._conns = []
+        if start:
+            self.start()
+
+    def start(self):
+        ctx = mp.get_context("spawn")   # workers load their own shard; nothing to inherit
+        for i in range(self.n):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_serve, name=f"shard-{i}", daemon=True,
+                               args=(os.path.join(self.path, f"shard-{i:03d}.jsonl"), child))
+            proc.start()
+            self._procs.append(proc)
+            self._conns.append(parent)
+
+        counts, first = Counter(), {}
+        for conn in self._conns:
+            _, vocab = conn.recv()
+            for t, (c, pos) in vocab.items():
+                counts[t] += c
+                first[t] = min(pos, first.get(t, pos))
+        vocab = {t: counts[t] for t in sorted(counts, key=first.__getitem__)}
+        self._scatter("spell", vocab, range(self.n))
+        logging.info("[SHARDS] %s shards, %s products (%s)",
+                     self.n, self.manifest["count"], self.manifest["by"])
+        return self
+
+    def close(self):
+        for conn in self._conns:
+            try:
+                conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+        self._procs, self._conns = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --------------------------------------------------
+    # Scatter / gather
+    # --------------------------------------------------
+    def _targets(self, category):
+        if category and self.manifest["by"] == "category":
+            return self.manifest["categories"].get(category.lower().strip(), [])
+        return range(self.n)
+
+    def _scatter(self, op, args, targets):
+        with self._lock:
+            targets = list(targets)
+            for i in targets:
+                self._conns[i].send((op, args))
+            parts = []
+            for i in targets:
+                status, reply = self._conns[i].recv()
+                if status != "ok":
+                    logging.warning("[SHARDS] Shard %s failed (%s) — results are partial", i, reply)
+                    continue
+                parts.append(reply)
+        return parts
+
+    @staticmethod
+    def _merge(parts, k):
+        merged = heapq.merge(*parts, key=lambda item: item[0])
+        return [p for _, p in zip(range(k), merged)]
+
+    def search(self, k=50, **kwargs):
+        """Top-k of ProductSearchAgent.search(**kwargs) over the full catalog."""
+        parts = self._scatter("search", (kwargs, k), self._targets(kwargs.get("category")))
+        return [p for _, p in self._merge(parts, k)]
+
+    def recommend(self, context=None, k=50, **kwargs):
+        """Top-k of ProductRecommenderAgent.rank(search(**kwargs), context)."""
+        parts = self._scatter("rank", (kwargs, context or {}, k),
+                              self._targets(kwargs.get("category")))
+        return [p for _, p in self._merge(parts, k)]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Split a catalog into shards / query them")
+    parser.add_argument("--products", default=os.path.join("data", "products.json"),
+                        help="JSON list, or JSONL streamed one product per line")
+    parser.add_argument("--out", default=os.path.join("data", "shards"))
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--by", choices=("hash", "category"), default="hash")
+    parser.add_argument("--query", default=None, help="smoke-test query after splitting")
+    args = parser.parse_args()
+
+    sizes = write_shards(iter_products(args.products), args.out, args.shards, by=args.by)
+    print(f"Wrote {sum(sizes)} products into {len(sizes)} shards → {args.out} {sizes}")
+
+    if args.query:
+        with ShardedCatalog(args.out) as catalog:
+            t0 = time.perf_counter()
+            top = catalog.recommend(context={"user_text": args.query}, keywords=args.query, k=10)
+            print(f"{(time.perf_counter() - t0) * 1000:.1f} ms")
+            for p in top:
+                print(" ", p.get("id"), p.get("title"), p.get("price"))
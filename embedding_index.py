@@ -0,0 +1,167 @@
+# agents/embedding_index.py (dense retrieval: sentence embeddings + IVF ANN)
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_ENCODERS = {}
+_ENCODERS_LOCK = threading.Lock()
+
+
+class SentenceEncoder:
+    """Small CPU sentence encoder (loaded once per process)."""
+
+    def __init__(self, model_name=DEFAULT_MODEL):
+        self.model_name = model_name
+        with _ENCODERS_LOCK:
+            if model_name not in _ENCODERS:
+                from sentence_transformers import SentenceTransformer
+                _ENCODERS[model_name] = SentenceTransformer(model_name, device="cpu")
+        self.model = _ENCODERS[model_name]
+
+    def encode(self, texts, batch_size=256):
+        return self.model.encode(
+            list(texts), batch_size=batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False,
+        ).astype(np.float32)
+
+
+def catalog_fingerprint(ids):
+    return hashlib.sha1("\x1f".join(map(str, ids)).encode("utf-8")).hexdigest()
+
+
+def _kmeans(x, k, iters=12, seed=0):
+    """Spherical k-means (vectors are L2-normalized)."""
+    rng = np.random.default_rng(seed)
+    cent = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ cent.T, axis=1)
+        for c in range(k):
+            members = x[assign == c]
+            if len(members):
+                v = members.sum(axis=0)
+                cent[c] = v / (np.linalg.norm(v) or 1.0)
+    return cent, np.argmax(x @ cent.T, axis=1)
+
+
+class ProductEmbeddingIndex:
+    """
+    Inverted-file (IVF) approximate nearest-neighbour index over product
+    blob embeddings.
+    - vectors stored as float16, memory-mapped from disk at startup
+    - coarse k-means centroids; a query scans only `nprobe` lists
+    - search() returns catalog positions, best first; an `allowed` mask
+      (facet filters) is applied before the top-k cut, and when the
+      probed lists hold fewer than k allowed products every allowed one
+      is scored exactly
+    """
+
+    def __init__(self, vectors, centroids, order, offsets, ids, encoder=None,
+                 nprobe=8, model_name=DEFAULT_MODEL):
+        self.vectors = vectors          # (N, d) float16, maybe memmap
+        self.centroids = centroids      # (L, d) float32
+        self.order = order              # positions grouped by list
+        self.offsets = offsets          # list l = order[offsets[l]:offsets[l+1]]
+        self.ids = ids
+        self.encoder = encoder
+        self.nprobe = nprobe
+        self.model_name = model_name
+
+    # --------------------------------------------------
+    # BUILD (offline)
+    # --------------------------------------------------
+    @classmethod
+    def build(cls, texts, ids, encoder, n_lists=None, nprobe=8):
+        x = encoder.encode(texts)
+        n = len(x)
+        n_lists = n_lists or max(1, min(n, int(4 * np.sqrt(n))))
+
+        centroids, assign = _kmeans(x, n_lists)
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        counts = np.bincount(assign, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        logging.info("[EMBED] Indexed %s products into %s lists", n, n_lists)
+        return cls(x.astype(np.float16), centroids.astype(np.float32), order, offsets,
+                   list(ids), encoder=encoder, nprobe=nprobe,
+                   model_name=getattr(encoder, "model_name", DEFAULT_MODEL))
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), np.asarray(self.vectors, dtype=np.float16))
+        np.savez(os.path.join(path, "ivf.npz"), centroids=self.centroids,
+                 order=self.order, offsets=self.offsets)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "nprobe": self.nprobe,
+                "count": len(self.ids),
+                "catalog": catalog_fingerprint(self.ids),
+                "ids": self.ids,
+            }, f)
+
+    @classmethod
+    def load(cls, path, encoder=None, ids=None):
+        """Memory-maps a saved index; returns None if it doesn't match `ids`."""
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if ids is not None and meta["catalog"] != catalog_fingerprint(ids):
+            logging.warning("[EMBED] Index at %s is stale for this catalog — rebuild it", path)
+            return None
+
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        ivf = np.load(os.path.join(path, "ivf.npz"))
+        encoder = encoder or SentenceEncoder(meta["model"])
+        return cls(vectors, ivf["centroids"], ivf["order"], ivf["offsets"], meta["ids"],
+                   encoder=encoder, nprobe=meta.get("nprobe", 8), model_name=meta["model"])
+
+    # --------------------------------------------------
+    # QUERY
+    # --------------------------------------------------
+    def search(self, query, k=200, allowed=None):
+        q = self.encoder.encode([query])[0]
+
+        probe = min(self.nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ q), probe - 1)[:probe]
+        cand = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+        if allowed is not None:
+            cand = cand[allowed[cand]]
+            if len(cand) < k:
+                # narrow filter: the probed lists ran dry → exact over the filtered set
+                cand = np.flatnonzero(allowed)
+        if not len(cand):
+            return []
+
+        sims = np.asarray(self.vectors[cand], dtype=np.float32) @ q
+        k = min(k, len(cand))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return cand[top].tolist()
+
+
+if __name__ == "__main__":
+    from agents.product_search_agent import ProductSearchAgent
+
+    parser = argparse.ArgumentParser(description="Build the product embedding index")
+    parser.add_argument("--products", default=os.path.join("data", "products.json"))
+    parser.add_argument("--out", default=os.path.join("data", "embedding_index"))
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--lists", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.products, "r", encoding="utf-8") as f:
+        products = json.load(f)
+
+    blob = ProductSearchAgent(products)._product_blob
+    index = ProductEmbeddingIndex.build(
+        [blob(p) for p in products], [p.get("id", i) for i, p in enumerate(products)],
+        SentenceEncoder(args.model), n_lists=args.lists,
+    )
+    index.save(args.out)
+    print(f"Saved {len(products)} vectors → {args.out}")
@@ -0,0 +1,331 @@
+# event_log.py (structured, rotating JSONL event log for ui_logs)
+import glob
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+# "[OUTPUT] Search results (12 items)" → tag=OUTPUT, msg=...
+_TAG_RE = re.compile(r"^\[([A-Za-z0-9_\-]+)\]\s*(.*)$", re.S)
+
+# rotated segment: <base>.<first_ts_ms>-<last_ts_ms>.jsonl[.gz|.zst]
+_SEG_RE = re.compile(r"\.(\d+)-(\d+)\.jsonl(\.gz|\.zst)?$")
+
+
+def make_event(line, **fields):
+    """Turns a legacy free-text UI log line into a structured event."""
+    m = _TAG_RE.match(line or "")
+    event = {"ts": round(time.time(), 6)}
+    if m:
+        event["tag"] = m.group(1).upper()
+        event["msg"] = m.group(2)
+    else:
+        event["tag"] = "LOG"
+        event["msg"] = line
+    event.update(fields)
+    return event
+
+
+class EventLog:
+    """
+    Append-only JSONL event log with rotation.
+    - rotates the active file by size (max_bytes) and age (max_age_s)
+    - rotated segments are named by their first/last event time, so
+      readers can skip whole files by time range
+    - optional gzip / zstd compression of rotated segments (background)
+    - keeps at most `max_segments` rotated segments (disk cap)
+    Not thread-safe: meant to be owned by a single writer thread.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, max_age_s=24 * 3600,
+                 compress="gzip", max_segments=50):
+        if compress == "zstd" and zstandard is None:
+            logging.info("[EVENT_LOG] zstandard not installed → gzip")
+            compress = "gzip"
+
+        self.path = path
+        self.base = path[:-len(".jsonl")] if path.endswith(".jsonl") else path
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.compress = compress
+        self.max_segments = max_segments
+
+        self._f = None
+        self._size = 0
+        self._first_ts = None
+        self._last_ts = None
+        self._open()
+
+    def _open(self):
+        self._f = open(self.path, "a", encoding="utf-8")
+        self._size = self._f.tell()
+        self._first_ts = self._last_ts = None
+
+        if self._size:
+            # resume: first line dates the segment
+            with open(self.path, "r", encoding="utf-8") as f:
+                try:
+                    self._first_ts = json.loads(f.readline())["ts"]
+                except Exception:
+                    self._first_ts = time.time()
+            self._last_ts = time.time()
+
+    # --------------------------------------------------
+    # Writing
+    # --------------------------------------------------
+    def write(self, events):
+        if not events:
+            return
+
+        if self._first_ts is None:
+            self._first_ts = events[0]["ts"]
+
+        data = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n"
+                       for e in events)
+        self._f.write(data)
+        self._f.flush()
+        self._size += len(data.encode("utf-8"))
+        self._last_ts = events[-1]["ts"]
+
+        if self._size >= self.max_bytes or time.time() - self._first_ts >= self.max_age_s:
+            self.rotate()
+
+    def rotate(self):
+        if not self._size:
+            return
+
+        self._f.close()
+        first_ms = int(self._first_ts * 1000)
+        last_ms = int(max(self._last_ts, self._first_ts) * 1000)
+        seg = f"{self.base}.{first_ms}-{last_ms}.jsonl"
+        os.replace(self.path, seg)
+        logging.info("[EVENT_LOG] Rotated → %s", seg)
+
+        if self.compress:
+            threading.Thread(target=self._compress, args=(seg,), daemon=True).start()
+        else:
+            self._prune()
+
+        self._open()
+
+    def _compress(self, seg):
+        try:
+            if self.compress == "zstd":
+                out = seg + ".zst"
+                with open(seg, "rb") as src, open(out + ".tmp", "wb") as dst:
+                    zstandard.ZstdCompressor(level=3).copy_stream(src, dst)
+            else:
+                out = seg + ".gz"
+                with open(seg, "rb") as src, gzip.open(out + ".tmp", "wb", compresslevel=6) as dst:
+                    while True:
+                        chunk = src.read(1 << 20)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+            os.replace(out + ".tmp", out)
+            os.remove(seg)
+        except Exception:
+            logging.exception("[EVENT_LOG] Compression failed for %s", seg)
+        self._prune()
+
+    def _prune(self):
+        segs = list_segments(self.path)
+        for _, _, p in segs[:max(0, len(segs) - self.max_segments)]:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def close(self):
+        if self._f:
+            self._f.close()
+            self._f = None
+
+
+# --------------------------------------------------
+# Reading
+# --------------------------------------------------
+def list_segments(path):
+    """Rotated segments as (first_ts, last_ts, path), oldest first."""
+    base = path[:-len(".jsonl")] if path.endswith(".jsonl") else path
+    segs = []
+    for p in glob.glob(glob.escape(base) + ".*-*.jsonl*"):
+        if p.endswith(".tmp"):
+            continue
+        m = _SEG_RE.search(p)
+        if m:
+            segs.append((int(m.group(1)) / 1000.0, int(m.group(2)) / 1000.0, p))
+    segs.sort()
+    return segs
+
+
+def _open_segment(p):
+    if p.endswith(".gz"):
+        return gzip.open(p, "rt", encoding="utf-8")
+    if p.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {p}")
+        import io
+        raw = zstandard.ZstdDecompressor().stream_reader(open(p, "rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    return open(p, "r", encoding="utf-8")
+
+
+def read_events(path, start=None, end=None, tags=None):
+    """
+    Streams events with start <= ts <= end (epoch seconds) from the
+    rotated segments + active file, one line at a time. Segments outside
+    the range are never opened.
+    """
+    tags = {t.upper() for t in tags} if tags else None
+
+    for p in log_files(path, start, end):
+        yield from read_segment(p, start, end, tags)
+
+
+def log_files(path, start=None, end=None):
+    """Segments overlapping [start, end] + the active file, oldest first."""
+    files = [p for first, last, p in list_segments(path)
+             if (start is None or last >= start) and (end is None or first <= end)]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def _open_binary(p):
+    if p.endswith(".gz"):
+        return gzip.open(p, "rb")
+    if p.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {p}")
+        import io
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(p, "rb"), closefd=True))
+    return open(p, "rb")
+
+
+def _segment_ms(p):
+    """Rotated segment → the first_ts_ms of its file name."""
+    m = _SEG_RE.search(p)
+    return int(m.group(1)) if m else None
+
+
+class LogTail:
+    """
+    Incremental reader of an EventLog: keeps a (segment, byte offset)
+    cursor and reads only the lines appended since the last call.
+    - a segment is identified by its first event's ts in ms — the stamp
+      rotate() puts in the file name — so when the active file has been
+      rotated away, the renamed (possibly compressed) segment is drained
+      from the saved offset, then newer segments and the new active file
+      are read from 0
+    - only complete lines are consumed; a half-written last line is
+      picked up on the next call
+    - no ts filtering: events sharing a timestamp or written out of
+      order are all delivered, exactly once
+    The cursor lives in memory: a new LogTail starts from the beginning.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.segment = None     # first_ts_ms of the file being read
+        self.offset = 0         # bytes of it already consumed
+        self._drained = set()   # rotated segments read to the end
+
+    def read(self):
+        """Generator of new events; the cursor advances as they are yielded."""
+        # one file per segment (mid-compression both .jsonl and .gz exist)
+        segs = {}
+        for _, _, p in list_segments(self.path):
+            segs.setdefault(_segment_ms(p), p)
+        if (self.segment is not None and self.segment not in segs
+                and self.segment not in self._drained and self.segment != self._active()):
+            logging.warning("[EVENT_LOG] Tail segment %s was pruned unread", self.segment)
+        self._drained &= segs.keys()
+
+        for ms, p in segs.items():
+            if ms in self._drained:
+                continue
+            if ms != self.segment:
+                # rotated before we ever saw it as the active file
+                self.segment, self.offset = ms, 0
+            if not (yield from self._read(p)):
+                return      # e.g. renamed by compression: retry next call
+            self._drained.add(ms)
+
+        active = self._active()
+        if active is None:
+            return
+        if active != self.segment:
+            self.segment, self.offset = active, 0
+        yield from self._read(self.path, active)
+
+    def _active(self):
+        """first_ts_ms of the active file (None while it is empty)."""
+        try:
+            with open(self.path, "rb") as f:
+                return self._first_ms(f)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _first_ms(f):
+        try:
+            return int(json.loads(f.readline())["ts"] * 1000)
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def _read(self, p, expect=None):
+        """Complete lines of `p` after the cursor; False if it can't be opened."""
+        try:
+            f = _open_binary(p)
+        except OSError:
+            return False
+        except RuntimeError:
+            logging.exception("[EVENT_LOG] Cannot open %s", p)
+            return True
+        with f:
+            # active file rotated since _active(): leave it for the next call
+            if expect is not None and self._first_ms(f) != expect:
+                return True
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break   # half-written: re-read next call
+                self.offset += len(line)
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue
+                yield e
+        return True
+
+
+def read_segment(p, start=None, end=None, tags=None):
+    """Events of one file (plain, .gz or .zst); tags must be upper-case."""
+    try:
+        f = _open_segment(p)
+    except (OSError, RuntimeError):
+        logging.exception("[EVENT_LOG] Cannot open %s", p)
+        return
+    with f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except ValueError:
+                continue
+            ts = e.get("ts", 0)
+            if start is not None and ts < start:
+                continue
+            if end is not None and ts > end:
+                continue
+            if tags and e.get("tag") not in tags:
+                continue
+            yield e
@@ -1,10 +1,18 @@
 import logging
 import os
+import threading
+from collections import OrderedDict
 from PIL import Image
 import numpy as np
 from transformers import BlipProcessor, BlipForConditionalGeneration
 
 
+def _normalize(out):
+    """Vision-tower pooled output (torch) → L2-normalized float32 rows."""
+    x = out.cpu().numpy().astype(np.float32)
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
 class FaceBodyAgent:
     def __init__(self):
         """
@@ -25,6 +33,14 @@ class FaceBodyAgent:
 
         self.use_grok = False
 
+        # captioning already runs the vision tower: keep its pooled output
+        # (per thread) so the photo's embedding needs no second pass
+        self._pooled = threading.local()
+        self._embeddings = OrderedDict()    # (path, mtime) → embedding
+        self._embeddings_lock = threading.Lock()
+        if self.model:
+            self.model.vision_model.register_forward_hook(self._keep_pooled)
+
     # ----------------------------------------------------
     # Better color detection
     # ----------------------------------------------------
@@ -146,12 +162,15 @@ class FaceBodyAgent:
             return self._fallback(img, image_path)
 
         try:
+            self._pooled.value = None
             inputs = self.processor(img, return_tensors="pt")
             caption_ids = self.model.generate(**inputs)
             caption = self.processor.decode(caption_ids[0], skip_special_tokens=True)
         except Exception:
             logging.exception("[BLIP] Failed generating caption")
             return self._fallback(img, image_path)
+        if self._pooled.value is not None:
+            self._cache_embedding(image_path, _normalize(self._pooled.value)[0])
 
         # 2) Parse attributes
         dom_colors = self._extract_dominant_colors(img)
@@ -174,6 +193,63 @@ class FaceBodyAgent:
             }
         }
 
+    # ----------------------------------------------------
+    # Image embeddings (BLIP vision tower) for visual search
+    # ----------------------------------------------------
+    def _keep_pooled(self, module, inputs, output):
+        pooled = getattr(output, "pooler_output", None)
+        self._pooled.value = pooled if pooled is not None else output[1]
+
+    @staticmethod
+    def _image_key(path):
+        try:
+            return os.path.abspath(path), os.path.getmtime(path)
+        except (OSError, TypeError):
+            return None
+
+    def _cache_embedding(self, path, vec, size=8):
+        key = self._image_key(path)
+        if key is None:
+            return
+        with self._embeddings_lock:
+            self._embeddings[key] = vec
+            self._embeddings.move_to_end(key)
+            while len(self._embeddings) > size:
+                self._embeddings.popitem(last=False)
+
+    def embed_images(self, images):
+        """(n, dim) L2-normalized image embeddings, or None without BLIP."""
+        if not self.model:
+            return None
+        import torch
+
+        imgs = [i if isinstance(i, Image.Image) else Image.open(i).convert("RGB") for i in images]
+        try:
+            pixels = self.processor(images=imgs, return_tensors="pt").pixel_values
+            with torch.no_grad():
+                out = self.model.vision_model(pixel_values=pixels).pooler_output
+        except Exception:
+            logging.exception("[BLIP] Failed embedding images")
+            return None
+        return _normalize(out)
+
+    def embed_image(self, image):
+        """One image's embedding; reuses the pass made by analyze() for the same file."""
+        if not image or (isinstance(image, str) and not os.path.exists(image)):
+            return None
+        if isinstance(image, str):
+            key = self._image_key(image)
+            with self._embeddings_lock:
+                vec = self._embeddings.get(key)
+            if vec is not None:
+                return vec
+        x = self.embed_images([image])
+        if x is None:
+            return None
+        if isinstance(image, str):
+            self._cache_embedding(image, x[0])
+        return x[0]
+
     # ----------------------------------------------------
     # Fallback (BLIP missing)
     # ----------------------------------------------------
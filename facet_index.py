@@ -0,0 +1,106 @@
+# agents/facet_index.py (bitmap facets + sorted price array for pre-filtering)
+import logging
+from collections import defaultdict
+
+import numpy as np
+
+from agents.query_analyzer import ANALYZER
+
+FACETS = ("gender", "category", "colors", "occasion", "style")
+
+
+def _values(p, facet):
+    v = p.get(facet)
+    if not v:
+        return []
+    if isinstance(v, str):
+        v = [v]
+    return [str(x).lower().strip() for x in v if x]
+
+
+class FacetIndex:
+    """
+    Precomputed filters over a product list (positions = list index).
+    - one NumPy bool bitmap per facet value (gender, category, each
+      color, each occasion, each style)
+    - token postings (int32 positions) for keyword / fit / style words
+    - price array sorted once; a price range is two searchsorted calls
+      → one contiguous slice of positions
+    Filters are combined with & / | before any per-product Python runs.
+    """
+
+    def __init__(self, products, blob=None):
+        self.n = len(products)
+        blob = blob or (lambda p: " ".join(str(v) for v in p.values()).lower())
+
+        facets = {f: defaultdict(list) for f in FACETS}
+        postings = defaultdict(list)
+        prices = np.zeros(self.n, dtype=np.float64)
+
+        for i, p in enumerate(products):
+            for f in FACETS:
+                for v in _values(p, f):
+                    facets[f][v].append(i)
+            for t in set(ANALYZER.tokens(blob(p))):
+                postings[t].append(i)
+            try:
+                prices[i] = float(p.get("price") or 0)
+            except (TypeError, ValueError):
+                prices[i] = 0.0
+
+        self.facets = {f: {v: self._bitmap(pos) for v, pos in vals.items()}
+                       for f, vals in facets.items()}
+        self.postings = {t: np.asarray(pos, dtype=np.int32) for t, pos in postings.items()}
+
+        self.price_order = np.argsort(prices, kind="stable").astype(np.int32)
+        self.sorted_prices = prices[self.price_order]
+        # missing / zero price always passes a budget (same as the old loop)
+        self.unpriced = prices == 0
+
+        logging.info("[FACETS] %s products, %s facet values, %s tokens",
+                     self.n, sum(len(v) for v in self.facets.values()), len(self.postings))
+
+    def _bitmap(self, positions):
+        m = np.zeros(self.n, dtype=bool)
+        m[positions] = True
+        return m
+
+    # --------------------------------------------------
+    # Bitmaps
+    # --------------------------------------------------
+    def all(self):
+        return np.ones(self.n, dtype=bool)
+
+    def facet(self, facet, value):
+        m = self.facets.get(facet, {}).get((value or "").lower().strip())
+        return m if m is not None else np.zeros(self.n, dtype=bool)
+
+    def token(self, word):
+        pos = self.postings.get(word)
+        return self._bitmap(pos) if pos is not None else np.zeros(self.n, dtype=bool)
+
+    def any_terms(self, terms):
+        """OR of analyzed terms (keyword match)."""
+        m = np.zeros(self.n, dtype=bool)
+        for w in terms:
+            pos = self.postings.get(w)
+            if pos is not None:
+                m[pos] = True
+        return m
+
+    def all_tokens(self, text):
+        """AND of every token in `text` ("slim fit" → slim & fit)."""
+        m = self.all()
+        for w in ANALYZER.tokens(text):
+            pos = self.postings.get(w)
+            if pos is None:
+                return np.zeros(self.n, dtype=bool)
+            hit = np.zeros(self.n, dtype=bool)
+            hit[pos] = True
+            m &= hit
+        return m
+
+    def price_between(self, low=None, high=None):
+        lo = 0 if low is None else np.searchsorted(self.sorted_prices, low, side="left")
+        hi = self.n if high is None else np.searchsorted(self.sorted_prices, high, side="right")
+        return self._bitmap(self.price_order[lo:hi]) | self.unpriced
@@ -3,6 +3,8 @@
 import os
 import json
 import logging
+import argparse
+import uuid
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -34,13 +36,40 @@ from agents.budget_agent import BudgetAgent
 from agents.event_agent import EventAgent
 from agents.region_agent import RegionAgent
 from agents.gift_agent import GiftAgent
+from agents.embedding_index import ProductEmbeddingIndex
+from agents.outfit_engine import OutfitEngine
+from agents.bundle_optimizer import BundleOptimizer
+from agents.visual_index import VisualIndex
+from tracing import Tracer, serve_metrics
+from ui_writer import UIWriter
+from event_log import EventLog
+from query_cache import QueryCache, intent_key
+from popularity_signals import PopularityAggregator
+from profile_store import ProfileStore
+from agents.query_analyzer import ANALYZER
+from agents.budget_agent import PriceRange
 
 ROOT = os.path.dirname(__file__)
 DATA_DIR = os.path.join(ROOT, "data")
 PRODUCTS_PATH = os.path.join(DATA_DIR, "products.json")
-USER_PROFILE_PATH = os.path.join(DATA_DIR, "user_profile.json")
+USER_PROFILE_PATH = os.path.join(DATA_DIR, "user_profile.json")   # legacy, imported once
+PROFILE_DB_PATH = os.path.join(DATA_DIR, "user_profiles.sqlite")
+DEFAULT_USER = os.getenv("FAI_USER", "default")
 UI_OUTPUT_PATH = os.path.join(DATA_DIR, "ui_output.json")
-UI_LOG_PATH = os.path.join(DATA_DIR, "ui_logs.txt")
+# built offline: python -m agents.embedding_index
+EMBEDDING_INDEX_DIR = os.path.join(DATA_DIR, "embedding_index")
+# built offline: python trend_miner.py (versioned v<N>.json + current.json)
+TREND_TABLE_PATH = os.path.join(DATA_DIR, "trends", "current.json")
+# built offline: python -m agents.product_recommender_agent (per-segment rank vectors)
+SEGMENT_VECTORS_DIR = os.path.join(DATA_DIR, "segment_vectors")
+# built offline: python -m agents.visual_index (product images, PQ; incremental)
+VISUAL_INDEX_DIR = os.path.join(DATA_DIR, "visual_index")
+# structured JSONL events; rotated segments sit next to it (see event_log.py)
+UI_LOG_PATH = os.path.join(DATA_DIR, "ui_logs.jsonl")
+UI_LOG_MAX_BYTES = int(os.getenv("UI_LOG_MAX_BYTES", 64 * 1024 * 1024))
+UI_LOG_COMPRESS = os.getenv("UI_LOG_COMPRESS", "gzip") or None  # gzip | zstd | ""
+# single (ui_output.json) | keyed (data/ui_output/<request_id>.json) | jsonl
+UI_OUTPUT_MODE = os.getenv("UI_OUTPUT_MODE", "single")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
@@ -55,6 +84,42 @@ def load_products(path=PRODUCTS_PATH):
     return []
 
 
+def load_retriever(products, path=EMBEDDING_INDEX_DIR):
+    """Memory-maps the dense product index if one was built for this catalog."""
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    try:
+        ids = [p.get("id", i) for i, p in enumerate(products)]
+        return ProductEmbeddingIndex.load(path, ids=ids)
+    except Exception:
+        logging.info("[EMBED] Embedding index not available — keyword search only.")
+        return None
+
+
+def load_visual_index(path=VISUAL_INDEX_DIR):
+    """Product-image index for photo → similar items, if one was built."""
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return None
+    try:
+        return VisualIndex.load(path)
+    except Exception:
+        logging.exception("[VISUAL] Visual index not available — text search only.")
+        return None
+
+
+# "show me items like this photo" → visual matches lead the results
+SIMILAR_WORDS = ("like this", "like these", "similar", "same as", "looks like")
+
+
+def with_corrections(note, fixes, extras):
+    """Spelling fixes are shown to the user, never applied silently."""
+    if not fixes:
+        return note
+    extras["corrections"] = dict(fixes)
+    shown = ", ".join(f'"{fix}" (no match for "{typo}")' for typo, fix in fixes.items())
+    return f"{note} — showing results for {shown}"
+
+
 def top1_text(item):
     if not item:
         return ""
@@ -63,57 +128,108 @@ def top1_text(item):
     return f"{title} — ₹{price}" if price else title
 
 
+_ui_writer = None
+
+
+def get_ui_writer():
+    """One background UI writer per process (threads don't survive fork)."""
+    global _ui_writer
+    if _ui_writer is None or _ui_writer.pid != os.getpid():
+        event_log = EventLog(UI_LOG_PATH, max_bytes=UI_LOG_MAX_BYTES, compress=UI_LOG_COMPRESS)
+        _ui_writer = UIWriter(event_log, UI_OUTPUT_PATH, output_mode=UI_OUTPUT_MODE)
+    return _ui_writer
+
+
 def write_ui_output(payload: dict):
     try:
-        tmp = UI_OUTPUT_PATH + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-        os.replace(tmp, UI_OUTPUT_PATH)
+        get_ui_writer().output(payload)
     except Exception:
         logging.exception("Failed to write UI output")
 
 
-def append_ui_log(line: str):
+def append_ui_log(line: str, **fields):
     try:
-        ts = datetime.utcnow().isoformat() + "Z"
-        with open(UI_LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(f"{ts} {line}\n")
+        get_ui_writer().log(line, **fields)
     except Exception:
         logging.exception("Failed to append UI log")
 
 
+def log_interaction(kind: str, product_id, region=None):
+    """Click / purchase events for the popularity aggregator."""
+    append_ui_log(f"[{kind.upper()}] {product_id}", id=product_id, region=region)
+
+
 class FashionAssistantSingleShot:
-    def __init__(self, hybrid=True):
+    # routes whose results don't depend on the user profile (shared cache entries)
+    SHARED_ROUTES = ("vision", "event", "trend", "budget", "gift")
+
+    def __init__(self, hybrid=True, tracer=None, headless=False, load_vision=True, user_id=None):
         self.hybrid = hybrid
+        self.tracer = tracer or Tracer()
         self.products = load_products()
-
-        # Core agents
-        self.speech = SpeechAgent(debug=False)
-        self.voice = VoiceAgent(debug=False)
+        self.catalog_version = 0
+        self._by_id = {p["id"]: p for p in self.products if p.get("id") is not None}
+        self.cache = QueryCache()
+        self.user_id = user_id or DEFAULT_USER
+        self.profiles = ProfileStore(PROFILE_DB_PATH)
+        self.profiles.import_legacy(DEFAULT_USER, USER_PROFILE_PATH)
+
+        # Core agents (headless = batch workers: no mic / TTS engines)
+        self.speech = None if headless else SpeechAgent(debug=False)
+        self.voice = None if headless else VoiceAgent(debug=False, background=True)
         self.router = route
         self.vision = VisionAgent()
-        self.facebody = FaceBodyAgent()
-        self.search = ProductSearchAgent(self.products)
+        # BLIP is heavy — text-only workers skip it until an image shows up
+        self._facebody = FaceBodyAgent() if load_vision else None
+        self.search = ProductSearchAgent(self.products, retriever=load_retriever(self.products))
         self.reco = ProductRecommenderAgent(self.products)
-        self.trend = TrendAgent(self.products)
+        self.reco.load_segments(SEGMENT_VECTORS_DIR)
+        self.trend = TrendAgent(self.products, table_path=TREND_TABLE_PATH)
+        self.visual = load_visual_index()
         self.budget = BudgetAgent()
         self.event = EventAgent()
         self.region = RegionAgent()
         self.gift = GiftAgent()
+        self._outfits = None
+        self.bundles = BundleOptimizer()
 
         self.stop_words = {"exit", "quit", "stop", "goodbye"}
 
+    @property
+    def facebody(self):
+        if self._facebody is None:
+            self._facebody = FaceBodyAgent()
+        return self._facebody
+
+    @property
+    def outfits(self):
+        # slot features cost a catalog pass — built on the first outfit query
+        if self._outfits is None:
+            self._outfits = OutfitEngine(self.products)
+        return self._outfits
+
+    def reload_products(self):
+        """Re-reads the catalog; bumping the version invalidates cached results."""
+        self.products = load_products()
+        self._by_id = {p["id"]: p for p in self.products if p.get("id") is not None}
+        self.search = ProductSearchAgent(self.products, retriever=load_retriever(self.products))
+        self.reco = ProductRecommenderAgent(self.products)
+        self.reco.load_segments(SEGMENT_VECTORS_DIR)
+        self.trend = TrendAgent(self.products, table_path=TREND_TABLE_PATH)
+        self.visual = load_visual_index()
+        self._outfits = None
+        self.catalog_version += 1
+
     def ask_input(self):
         if self.hybrid:
-            audio = self.speech.record_audio()
-            if audio:
-                text = self.speech.audio_to_text(audio)
-                if text:
-                    logging.info("[USER SAID] %s", text)
-                    if text.lower().strip() in self.stop_words:
-                        self.voice.speak("Goodbye!")
-                        return None
-                    return text.strip()
+            self.voice.wait()   # never record while TTS is still playing
+            text = self.speech.stream_transcribe()
+            if text:
+                logging.info("[USER SAID] %s", text)
+                if text.lower().strip() in self.stop_words:
+                    self.voice.speak("Goodbye!")
+                    return None
+                return text.strip()
 
         txt = input("You (text): ").strip()
         if not txt:
@@ -123,131 +239,237 @@ class FashionAssistantSingleShot:
             return None
         return txt
 
-    def run(self):
-        self.voice.speak("Hello! Ask me for outfits, or say 'upload image' to try-on. ")
-        user_text = self.ask_input()
-        if not user_text:
-            return
-
-        logging.info("INPUT: %s", user_text)
-        append_ui_log(f"[INPUT] {user_text}")
-
-        route_name = self.router(user_text)
-        logging.info("ROUTE: %s", route_name)
-
-        final = []
-        note = None
-        analysis = {}
-
-        try:
-            # ----------------------------------------------------------
-            # VISION ROUTE (image → keywords → search)
-            # ----------------------------------------------------------
-            if route_name == "vision":
-                # ask for image
-                self.voice.speak("Please enter your image path.")
-                img = input("Image path: ").strip()
-
-                # analyze
-                analysis = self.facebody.analyze(img)
-                append_ui_log(f"[VISION] analyzed {img}")
-                logging.debug("[VISION] analysis: %s", analysis)
-
-                # store analysis for second question
-                self.last_analysis = analysis
-
-                # Ask user what they want next
-                self.voice.speak(
-                    "Image uploaded successfully! What would you like to know? "
-                )
-                print("\n🟦 Image uploaded successfully!")
-                print("Now ask anything — e.g., 'farewell outfit', 'casual look', 'jeans under 500', 'wedding suggestions'.\n")
-
-                # Get next user query
-                follow_up = self.ask_input()
-                if not follow_up:
-                    return
-
-                append_ui_log(f"[VISION-FOLLOWUP] {follow_up}")
-
-                # Detect event or just general query
+    # ----------------------------------------------------------
+    # ROUTE HANDLING (shared by interactive + batch mode)
+    # ----------------------------------------------------------
+    def recommend(self, route_name, user_text, trace, analysis=None, follow_up=None, extras=None,
+                  profile=None):
+        """
+        Runs detection → search → rank for one routed query.
+        Returns (final_products, note); structured results (outfits) are
+        added to `extras` as product IDs. `profile` (ProfileStore) stands
+        in for a fresh image analysis on the personalized routes.
+        """
+        analysis = analysis if analysis is not None else {}
+        extras = extras if extras is not None else {}
+        profile = profile or {}
+
+        # ----------------------------------------------------------
+        # VISION ROUTE (image → keywords → search → rank)
+        # ----------------------------------------------------------
+        if route_name == "vision":
+            follow_up = follow_up or user_text
+
+            # Detect event or just general query
+            with trace.span("detection"):
                 ev, templates = self.event.detect(follow_up)
                 budget_val = self.budget.extract(follow_up)
                 region = self.region.detect(follow_up)
 
-                # Build keyword seed from analysis
-                base_keywords = analysis.get("outfit_recommendations") or []
-                dom = analysis.get("dominant_colors", [])
-                for c in dom:
-                    base_keywords.append(c)
+            # Build keyword seed from analysis
+            base_keywords = analysis.get("outfit_recommendations") or []
+            dom = analysis.get("dominant_colors", [])
+            for c in dom:
+                base_keywords.append(c)
 
-                # build final query keywords
-                query_parts = base_keywords
+            # build final query keywords
+            query_parts = base_keywords
 
-                # add event templates
-                if templates:
-                    query_parts += templates
+            # add event templates
+            if templates:
+                query_parts += templates
 
-                # add user given words directly
-                query_parts += follow_up.lower().split()
+            # add user given words directly
+            query_parts += follow_up.lower().split()
 
-                query = " ".join(list(dict.fromkeys(query_parts)))  # unique
+            query = " ".join(list(dict.fromkeys(query_parts)))  # unique
 
-                # run final search
-                final = self.search.search(
+            # run final search
+            with trace.span("search"):
+                fixes = {}
+                s = self.search.search(
                     keywords=query,
                     budget=budget_val,
-                    region=region
+                    region=region,
+                    corrections=fixes
+                )
+
+            # skin tone / gender / dominant colors → cached segment vector
+            with trace.span("rank"):
+                final = self.reco.rank(
+                    s,
+                    context={
+                        "user_text": follow_up, "region": region, "budget": budget_val,
+                        "event": ev, "outfit_recommendations": templates or [],
+                        "analysis": analysis,
+                    }
                 )
 
-                note = f"Vision + query: {follow_up} → {query}"
+            return final, with_corrections(f"Vision + query: {follow_up} → {query}", fixes, extras)
 
-            # ----------------------------------------------------------
-            elif route_name == "event":
+        # ----------------------------------------------------------
+        if route_name == "outfit":
+            with trace.span("detection"):
+                ev, _ = self.event.detect(user_text)
+                b = self.budget.extract(user_text)
+            with trace.span("search"):
+                looks = self.outfits.assemble(
+                    analysis=analysis or profile.get("analysis"), budget=b, event=ev
+                )
+            final = list({id(p): p for o in looks for p in o["items"]}.values())
+            extras["outfits"] = [
+                {"ids": [p.get("id") for p in o["items"]],
+                 "total_price": o["total_price"], "score": o["score"]}
+                for o in looks
+            ]
+            return final, f"Complete looks ({ev})" if ev else "Complete looks"
+
+        if route_name == "event":
+            with trace.span("detection"):
                 ev, templates = self.event.detect(user_text)
                 region = self.region.detect(user_text)
+                b = self.budget.extract(user_text)
+            with trace.span("search"):
                 final = self.search.search(keywords=" ".join(templates), region=region)
-                note = f"Event: {ev}"
-
-            elif route_name == "trend":
+            # "wedding outfit for 5000" → best item set within the total
+            if b:
+                with trace.span("bundle"):
+                    self.add_bundle(extras, final, b, analysis=analysis, event=ev)
+            return final, f"Event: {ev}"
+
+        if route_name == "trend":
+            with trace.span("detection"):
                 region = self.region.detect(user_text)
+            with trace.span("search"):
                 final = self.trend.get_trending(region=region, top_k=10)
-                note = "Trending items"
+            return final, "Trending items"
 
-            elif route_name == "budget":
+        if route_name == "budget":
+            with trace.span("detection"):
                 b = self.budget.extract(user_text)
-                final = self.search.search(keywords=user_text, budget=b)
-                note = f"Budget: ₹{b}"
+            with trace.span("search"):
+                fixes = {}
+                final = self.search.search(keywords=user_text, budget=b, corrections=fixes)
+            return final, with_corrections(f"Budget: {b}", fixes, extras)
 
-            elif route_name == "gift":
+        if route_name == "gift":
+            with trace.span("detection"):
                 who, opts = self.gift.detect(user_text)
+                b = self.budget.extract(user_text)
+            with trace.span("search"):
                 final = self.search.search(keywords=" ".join(opts))
-                note = f"Gift ideas for {who}"
-
-            # ----------------------------------------------------------
-            # GENERIC SEARCH ROUTE
-            # ----------------------------------------------------------
-            else:
-                region = self.region.detect(user_text)
-                b_val = self.budget.extract(user_text)
-                s = self.search.search(keywords=user_text, budget=b_val, region=region)
-
-                final = self.reco.rank(
-                    s,
-                    context={"user_text": user_text, "region": region, "budget": b_val}
-                )
-                note = "Search results"
-
+            # "gift set for mom under 3000" → best item set within the total;
+            # like the event route, the budget caps the bundle, not each item
+            if b:
+                with trace.span("bundle"):
+                    self.add_bundle(extras, final, b, analysis=analysis)
+            return final, f"Gift ideas for {who}"
+
+        # ----------------------------------------------------------
+        # GENERIC SEARCH ROUTE
+        # ----------------------------------------------------------
+        with trace.span("detection"):
+            region = self.region.detect(user_text)
+            b_val = self.budget.extract(user_text)
+        with trace.span("search"):
+            fixes = {}
+            s = self.search.search(keywords=user_text, budget=b_val, region=region,
+                                   corrections=fixes)
+
+        # returning users: stored analysis / colors / usual price band
+        band = profile.get("price_band")
+        with trace.span("rank"):
+            final = self.reco.rank(
+                s,
+                context={
+                    "user_text": user_text, "region": region,
+                    "budget": b_val or (PriceRange(*band, hard=False) if band else None),
+                    "preferred_colors": profile.get("preferred_colors", []),
+                    "analysis": analysis or profile.get("analysis", {}),
+                }
+            )
+        return final, with_corrections("Search results", fixes, extras)
+
+    def add_similar(self, extras, final, image_path, text="", k=12):
+        """
+        Products whose images are nearest to the uploaded photo (BLIP
+        vision embedding → VisualIndex). They lead the results for "like
+        this" / "similar" requests, otherwise follow the text results.
+        The embedding is the pooled output of the vision pass analyze()
+        already made for captioning, so the photo is encoded once.
+        Not cached: the key only fingerprints the analysis, not the photo.
+        """
+        if self.visual is None or not image_path:
+            return final
+        vec = self.facebody.embed_image(image_path)
+        if vec is None:
+            return final
+        similar = [self._by_id[i] for i in self.visual.search(vec, k) if i in self._by_id]
+        if not similar:
+            return final
+        extras["similar"] = [p.get("id") for p in similar]
+
+        if any(w in (text or "").lower() for w in SIMILAR_WORDS):
+            seen = {id(p) for p in similar}
+            return similar + [p for p in final if id(p) not in seen]
+        shown = {id(p) for p in final}
+        return final + [p for p in similar if id(p) not in shown]
+
+    def add_bundle(self, extras, candidates, budget, analysis=None, event=None):
+        bundle = self.bundles.best_bundle(candidates, budget, analysis=analysis, event=event)
+        if bundle:
+            extras["bundle"] = {
+                "ids": [p.get("id") for p in bundle["items"]],
+                "total_price": bundle["total_price"],
+                "score": bundle["score"],
+            }
+
+    def remember(self, user_id, text, analysis=None):
+        """Updates the user's profile from this request."""
+        try:
+            if analysis:
+                self.profiles.update_analysis(user_id, analysis)
+            colors = set(ANALYZER.tokens(text)) & set(self.search.facets.facets["colors"])
+            b = self.budget.extract(text)
+            self.profiles.observe_query(user_id, sorted(colors), b if b and b.hard else None)
         except Exception:
-            logging.exception("Processing failed")
-            append_ui_log("[ERROR] Processing failed")
-            final = []
-
-        # Speak top result
-        top_item = final[0] if final else None
-        spoken = top1_text(top_item) if top_item else "Sorry, I couldn't find a recommendation."
-        self.voice.speak(spoken)
-
+            logging.exception("[PROFILE] Update failed")
+
+    def cached_recommend(self, route_name, user_text, trace, analysis=None, follow_up=None, extras=None,
+                         profile=None):
+        """
+        recommend() behind the query cache. The key is the parsed intent
+        (route, event, region, budget, token set, analysis fingerprint), so
+        'jeans under 500' and 'Jeans under ₹500' share one entry.
+        """
+        text = follow_up or user_text
+        with trace.span("cache"):
+            ev, _ = self.event.detect(text)
+            budget, rest = self.budget.split(text)
+            key = intent_key(
+                route_name, rest, event=ev, region=self.region.detect(text),
+                budget=budget, analysis=analysis,
+                profile=None if route_name in self.SHARED_ROUTES else profile
+            )
+            hit = self.cache.get(key, self.catalog_version)
+
+        extras = extras if extras is not None else {}
+        if hit:
+            ids, note, cached_extras = hit
+            extras.update(cached_extras)
+            return [self._by_id[i] for i in ids if i in self._by_id], note
+
+        final, note = self.recommend(
+            route_name, user_text, trace, analysis=analysis, follow_up=follow_up, extras=extras,
+            profile=profile
+        )
+
+        ids = [p.get("id") for p in final]
+        if all(i is not None for i in ids):
+            self.cache.put(key, self.catalog_version, ids, note, extras=dict(extras))
+        return final, note
+
+    def build_payload(self, user_text, route_name, note, analysis, final, trace, extras=None):
         # UI results
         results_for_ui = []
         for p in final:
@@ -264,16 +486,171 @@ class FashionAssistantSingleShot:
             })
 
         payload = {
+            "request_id": uuid.uuid4().hex,
             "timestamp": datetime.utcnow().isoformat() + "Z",
             "user_text": user_text,
             "route": route_name,
             "note": note,
             "analysis": analysis,
-            "results": results_for_ui
+            "results": results_for_ui,
+            # live dict: stages finishing after the file write still land
+            # in the returned payload
+            "timings": trace.timings
         }
+        # outfits / bundle: groups of result IDs ({"ids", "total_price", "score"})
+        payload.update(extras or {})
+        return payload
+
+    # ----------------------------------------------------------
+    # HEADLESS (batch) — no mic, no TTS, no UI files
+    # ----------------------------------------------------------
+    def handle_query(self, user_text, image_path=None, user_id=None):
+        """
+        Answers one query without any interaction.
+        An image path forces the vision route and user_text becomes the
+        follow-up question about that image. `user_id` selects the stored
+        profile used for personalization and updated from this request;
+        without one (batch / pool) the query is anonymous, so results stay
+        reproducible and no profile is written.
+        """
+        trace = self.tracer.start()
+
+        with trace.span("routing"):
+            route_name = "vision" if image_path else self.router(user_text)
+        trace.route = route_name
+
+        final = []
+        note = None
+        analysis = {}
+        extras = {}
+
+        try:
+            if image_path:
+                with trace.span("analysis"):
+                    analysis = self.facebody.analyze(image_path)
+
+            profile = None
+            if user_id:
+                with trace.span("profile"):
+                    profile = self.profiles.get(user_id)
+            final, note = self.cached_recommend(
+                route_name, user_text, trace, analysis=analysis, extras=extras, profile=profile
+            )
+            if image_path:
+                with trace.span("similar"):
+                    final = self.add_similar(extras, final, image_path, user_text)
+            if user_id:
+                with trace.span("profile"):
+                    self.remember(user_id, user_text, analysis)
+
+        except Exception:
+            logging.exception("Processing failed")
+            final = []
+
+        payload = self.build_payload(user_text, route_name, note, analysis, final, trace, extras)
+        self.tracer.record(trace)
+        return payload
+
+    def run(self):
+        trace = self.tracer.start()
+
+        # prompts finish before any mic capture: the recorder (and its VAD
+        # noise calibration) must not hear the assistant's own voice
+        with trace.wait("prompt_tts"):
+            self.voice.speak("Hello! Ask me for outfits, or say 'upload image' to try-on. ")
+        with trace.wait("input"):
+            user_text = self.ask_input()
+        if not user_text:
+            return
+
+        logging.info("INPUT: %s", user_text)
+        with trace.span("append_ui_log"):
+            append_ui_log(f"[INPUT] {user_text}")
+
+        with trace.span("routing"):
+            route_name = self.router(user_text)
+        trace.route = route_name
+        logging.info("ROUTE: %s", route_name)
+
+        final = []
+        note = None
+        analysis = {}
+        follow_up = None
+        extras = {}
+
+        try:
+            if route_name == "vision":
+                # ask for image
+                with trace.wait("prompt_tts"):
+                    self.voice.speak("Please enter your image path.")
+                with trace.wait("input"):
+                    img = input("Image path: ").strip()
 
-        write_ui_output(payload)
-        append_ui_log(f"[OUTPUT] {note or 'results'} ({len(results_for_ui)} items)")
+                # analyze
+                with trace.span("analysis"):
+                    analysis = self.facebody.analyze(img)
+                with trace.span("append_ui_log"):
+                    append_ui_log(f"[VISION] analyzed {img}")
+                logging.debug("[VISION] analysis: %s", analysis)
+
+                # store analysis for second question
+                self.last_analysis = analysis
+
+                # Ask user what they want next
+                with trace.wait("prompt_tts"):
+                    self.voice.speak(
+                        "Image uploaded successfully! What would you like to know? "
+                    )
+                print("\n🟦 Image uploaded successfully!")
+                print("Now ask anything — e.g., 'farewell outfit', 'casual look', 'jeans under 500', 'wedding suggestions'.\n")
+
+                # Get next user query
+                with trace.wait("input"):
+                    follow_up = self.ask_input()
+                if not follow_up:
+                    return
+
+                with trace.span("append_ui_log"):
+                    append_ui_log(f"[VISION-FOLLOWUP] {follow_up}")
+
+            with trace.span("profile"):
+                profile = self.profiles.get(self.user_id)
+            final, note = self.cached_recommend(
+                route_name, user_text, trace, analysis=analysis, follow_up=follow_up,
+                extras=extras, profile=profile
+            )
+            if route_name == "vision":
+                with trace.span("similar"):
+                    final = self.add_similar(extras, final, analysis.get("image_path"), follow_up)
+            with trace.span("profile"):
+                self.remember(self.user_id, follow_up or user_text, analysis)
+
+        except Exception:
+            logging.exception("Processing failed")
+            with trace.span("append_ui_log"):
+                append_ui_log("[ERROR] Processing failed")
+            final = []
+
+        # Speak top result
+        top_item = final[0] if final else None
+        spoken = top1_text(top_item) if top_item else "Sorry, I couldn't find a recommendation."
+        with trace.span("tts"):
+            self.voice.speak_async(spoken)
+
+        payload = self.build_payload(user_text, route_name, note, analysis, final, trace, extras)
+        results_for_ui = payload["results"]
+
+        with trace.span("write_ui_output"):
+            write_ui_output(payload)
+        with trace.span("append_ui_log"):
+            # ids + region → impressions for the popularity aggregator
+            append_ui_log(
+                f"[OUTPUT] {note or 'results'} ({len(results_for_ui)} items)",
+                ids=[r["id"] for r in results_for_ui[:10] if r.get("id") is not None],
+                region=self.region.detect(follow_up or user_text),
+                route=route_name,
+            )
+        self.tracer.record(trace)
 
         # Terminal Output
         def short_link(path):
@@ -312,11 +689,55 @@ class FashionAssistantSingleShot:
         print("          THANK YOU FOR USING F.A.I.")
         print("-"*45 + "\n")
 
+        # let the top-result announcement finish before the next turn / exit
+        self.voice.wait()
         return payload
 
 
 if __name__ == "__main__":
-    FashionAssistantSingleShot(hybrid=True).run()
+    parser = argparse.ArgumentParser(description="F.A.I. fashion assistant")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="server mode: keep answering queries and expose "
+                             "Prometheus latency metrics on this port")
+    parser.add_argument("--user", default=None,
+                        help="user id whose stored profile personalizes results")
+    parser.add_argument("--popularity-interval", type=int, default=60,
+                        help="server mode: seconds between live popularity "
+                             "refreshes from ui_logs (0 = off)")
+    parser.add_argument("--batch", metavar="QUERIES_JSONL",
+                        help="offline mode: answer every query in a JSONL file")
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, "batch_output.jsonl"),
+                        help="batch mode: JSONL results path")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="batch mode: text worker processes (default: all cores)")
+    parser.add_argument("--vision-workers", type=int, default=1,
+                        help="batch mode: worker processes that load BLIP")
+    parser.add_argument("--unordered", action="store_true",
+                        help="batch mode: write results as they complete")
+    parser.add_argument("--offset", type=int, default=0,
+                        help="batch mode: resume from this input line")
+    parser.add_argument("--window", type=int, default=None,
+                        help="batch mode: max queries in flight (memory bound)")
+    args = parser.parse_args()
+
+    if args.batch:
+        from batch_mode import run_batch
+        run_batch(args.batch, args.out, workers=args.workers,
+                  ordered=not args.unordered, offset=args.offset, window=args.window,
+                  vision_workers=args.vision_workers)
+        raise SystemExit(0)
+
+    assistant = FashionAssistantSingleShot(hybrid=True, user_id=args.user)
+    if args.metrics_port is None:
+        assistant.run()
+    else:
+        serve_metrics(assistant.tracer, port=args.metrics_port)
+        if args.popularity_interval:
+            PopularityAggregator().start(
+                UI_LOG_PATH, lambda: assistant.trend, interval_s=args.popularity_interval
+            )
+        while assistant.run():
+            pass
 
 
 
@@ -0,0 +1,215 @@
+# agents/outfit_engine.py (complete-the-look: outfit assembly by beam search)
+import logging
+
+import numpy as np
+
+from agents.budget_agent import as_range
+from agents.outfit_score_agent import OutfitScoreAgent, WARM_PALETTE, COOL_PALETTE
+
+# category words → outfit slot ("full" = one-piece, replaces top + bottom)
+SLOT_WORDS = {
+    "top": ["shirt", "tshirt", "t-shirt", "tee", "top", "blouse", "kurta", "kurti",
+            "hoodie", "sweatshirt", "sweater", "blazer", "jacket", "coat", "turtleneck"],
+    "bottom": ["jeans", "trousers", "chinos", "pants", "shorts", "skirt", "joggers",
+               "cargo", "leggings", "palazzo", "salwar"],
+    "full": ["dress", "gown", "saree", "lehenga", "sherwani", "jumpsuit", "co-ord",
+             "anarkali", "suit"],
+    "footwear": ["sneakers", "shoes", "heels", "boots", "sandals", "loafers", "flats",
+                 "juttis", "mojari", "slippers", "footwear"],
+    "accessory": ["watch", "belt", "handbag", "bag", "earrings", "necklace", "sunglasses",
+                  "bracelet", "scarf", "cap", "wallet", "dupatta", "jewellery", "clutch"],
+}
+
+PLANS = [
+    ("top", "bottom", "footwear", "accessory"),
+    ("full", "footwear", "accessory"),
+]
+
+NEUTRALS = {"black", "white", "grey", "gray", "beige", "navy", "cream", "silver", "gold"}
+
+
+def slot_of(product):
+    for text in ((product.get("category") or ""), (product.get("title") or "")):
+        words = text.lower().replace("/", " ").split()
+        for slot, vocab in SLOT_WORDS.items():
+            if any(w in vocab or w.rstrip("s") in vocab for w in words):
+                return slot
+    return None
+
+
+def color_harmony(a, b):
+    """0–1 compatibility of two color names."""
+    if not a or not b:
+        return 0.5
+    if a in NEUTRALS or b in NEUTRALS:
+        return 1.0
+    if a == b:
+        return 0.8
+    if (a in WARM_PALETTE and b in WARM_PALETTE) or (a in COOL_PALETTE and b in COOL_PALETTE):
+        return 0.6
+    return 0.2
+
+
+class OutfitEngine:
+    """
+    Assembles top + bottom + footwear + accessory (or one-piece +
+    footwear + accessory) outfits from the catalog.
+    - item quality: OutfitScoreAgent.score_batch over each slot
+    - pairwise fit: precomputed color-harmony (C×C), gender (G×G) and
+      occasion-bitmask tables, looked up per item pair
+    - beam search over per-slot top-k lists with budget pruning, so the
+      Cartesian product is never enumerated
+    """
+
+    def __init__(self, products, scorer=None, per_slot=40, beam=64,
+                 pair_weight=12.0, occasion_weight=4.0):
+        self.products = products or []
+        self.scorer = scorer or OutfitScoreAgent()
+        self.per_slot = per_slot
+        self.beam = beam
+        self.pair_weight = pair_weight
+        self.occasion_weight = occasion_weight
+
+        n = len(self.products)
+        self.price = np.zeros(n, dtype=np.float64)
+        color_ids, gender_ids, occ_bits = {}, {"": 0, "unisex": 0}, {}
+        self.color = np.zeros(n, dtype=np.int32)      # 0 = unknown
+        self.gender = np.zeros(n, dtype=np.int32)     # 0 = unisex / unknown
+
+        slots = {s: [] for s in SLOT_WORDS}
+        occ_of = []
+        for i, p in enumerate(self.products):
+            self.price[i] = p.get("price") or 0
+            colors = [c.lower() for c in p.get("colors", [])]
+            if colors:
+                self.color[i] = color_ids.setdefault(colors[0], len(color_ids) + 1)
+            g = (p.get("gender") or "").lower()
+            self.gender[i] = gender_ids.setdefault(g, len(gender_ids) - 1)
+            occ = p.get("occasion") or []
+            occ_of.append([occ_bits.setdefault(o.lower(), len(occ_bits))
+                           for o in ([occ] if isinstance(occ, str) else occ)])
+            slot = slot_of(p)
+            if slot:
+                slots[slot].append(i)
+
+        # occasion bitmask: one uint64 word per 64 occasions (no bit sharing)
+        self.occasion = np.zeros((n, max(1, -(-len(occ_bits) // 64))), dtype=np.uint64)
+        for i, bits in enumerate(occ_of):
+            for bit in bits:
+                self.occasion[i, bit // 64] |= np.uint64(1 << (bit % 64))
+
+        # pairwise tables
+        names = [None] + sorted(color_ids, key=color_ids.get)
+        self.harmony = np.array([[color_harmony(a, b) for b in names] for a in names],
+                                dtype=np.float32)
+        g = len(gender_ids) - 1
+        self.gender_ok = np.eye(g, dtype=bool)
+        self.gender_ok[0, :] = self.gender_ok[:, 0] = True
+        self.occ_bits = occ_bits
+
+        self.slots = {s: np.asarray(pos, dtype=np.int64) for s, pos in slots.items()}
+        self.features = {s: self.scorer.featurize([self.products[i] for i in pos])
+                         for s, pos in self.slots.items()}
+
+        logging.info("[OUTFIT] Slots: %s", {s: len(p) for s, p in self.slots.items()})
+
+    # --------------------------------------------------
+    # Per-slot candidates
+    # --------------------------------------------------
+    def _candidates(self, slot, analysis, preferred_colors, budget, event):
+        pos = self.slots[slot]
+        if not len(pos):
+            return pos, np.zeros(0, dtype=np.float32)
+
+        scores = self.scorer.score_batch(
+            self.features[slot], analysis, preferred_colors, budget, event
+        ).astype(np.float32)
+        if budget:
+            scores[self.price[pos] > budget] = -np.inf   # budget = total cap
+
+        k = min(self.per_slot, len(pos))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.isfinite(scores[top])]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return pos[top], scores[top]
+
+    # --------------------------------------------------
+    # Beam search over one slot plan
+    # --------------------------------------------------
+    def _search_plan(self, plan, cands, budget):
+        plan = [s for s in plan if len(cands[s][0])]
+        if not plan:
+            return []
+
+        # cheapest completion of the remaining slots → budget pruning
+        rest = [0.0] * (len(plan) + 1)
+        for d in range(len(plan) - 1, -1, -1):
+            rest[d] = rest[d + 1] + float(self.price[cands[plan[d]][0]].min())
+
+        items = np.zeros((1, 0), dtype=np.int64)
+        score = np.zeros(1, dtype=np.float32)
+        price = np.zeros(1, dtype=np.float64)
+
+        for d, slot in enumerate(plan):
+            pos, unary = cands[slot]
+
+            gain = np.tile(unary, (len(items), 1))
+            for j in range(items.shape[1]):
+                prev = items[:, j]
+                gain += self.pair_weight * self.harmony[self.color[prev][:, None], self.color[pos][None, :]]
+                shared = (self.occasion[prev][:, None, :] & self.occasion[pos][None, :, :]).any(axis=2)
+                gain += self.occasion_weight * shared
+                gain[~self.gender_ok[self.gender[prev][:, None], self.gender[pos][None, :]]] = -np.inf
+
+            total = price[:, None] + self.price[pos][None, :]
+            new_score = score[:, None] + gain
+            if budget:
+                new_score[total + rest[d + 1] > budget] = -np.inf
+
+            flat = new_score.ravel()
+            k = min(self.beam, int(np.isfinite(flat).sum()))
+            if k == 0:
+                return []
+            best = np.argpartition(-flat, k - 1)[:k]
+            b, c = np.divmod(best, len(pos))
+
+            items = np.concatenate([items[b], pos[c][:, None]], axis=1)
+            score = flat[best]
+            price = total[b, c]
+
+        return list(zip(score.tolist(), price.tolist(), items.tolist()))
+
+    # --------------------------------------------------
+    # PUBLIC
+    # --------------------------------------------------
+    def assemble(self, analysis=None, preferred_colors=None, budget=None, event=None, n=5):
+        """
+        Best `n` outfits, each {"items", "total_price", "score"}, with
+        total_price <= the budget's max when a budget is given.
+        """
+        analysis = analysis or {}
+        cap = as_range(budget).high if budget else None   # the whole look must fit the max
+        cands = {s: self._candidates(s, analysis, preferred_colors, cap, event)
+                 for s in self.slots}
+
+        found = []
+        for plan in PLANS:
+            found.extend(self._search_plan(plan, cands, cap))
+
+        # rank on the reported per-item score, not the raw sum (which
+        # always favors plans with more pieces)
+        found.sort(key=lambda x: -x[0] / len(x[2]))
+        outfits, seen = [], set()
+        for s, total, items in found:
+            key = frozenset(items)
+            if key in seen:
+                continue
+            seen.add(key)
+            outfits.append({
+                "items": [self.products[i] for i in items],
+                "total_price": round(total, 2),
+                "score": round(s / len(items), 2),
+            })
+            if len(outfits) >= n:
+                break
+        return outfits
@@ -1,5 +1,117 @@
 import logging
 
+import numpy as np
+
+from agents.budget_agent import as_range
+
+WARM_PALETTE = ["beige", "brown", "olive", "maroon", "rust", "mustard"]
+COOL_PALETTE = ["blue", "grey", "black", "white", "navy", "silver"]
+WARM_SKIN = ["warm", "tan", "medium warm"]
+COOL_SKIN = ["cool", "fair", "light cool"]
+
+
+class OutfitFeatures:
+    """
+    Per-catalog-slice feature matrix for batch scoring. Everything that
+    doesn't depend on the user is computed once here:
+      - color / tag / occasion vocab → (N, V) bool matrices
+      - warm / cool palette hits, gender, price
+      - the static part of the score (trend, rating, versatility, style)
+    """
+
+    def __init__(self, products):
+        self.products = products
+        n = len(products)
+
+        titles, styles, genders = [], [], []
+        colors, tags, occasions = [], [], []
+        price = np.zeros(n, dtype=np.float64)
+        static = np.full(n, 50, dtype=np.int64)   # base score
+
+        for i, p in enumerate(products):
+            t = [x.lower() for x in p.get("tags", [])]
+            c = [x.lower() for x in p.get("colors", [])]
+            occ = p.get("occasion") or ""
+            if isinstance(occ, str):
+                occ = [occ]
+            style = (p.get("style") or "").lower()
+
+            titles.append((p.get("title") or "").lower())
+            styles.append(style)
+            genders.append((p.get("gender") or "").lower())
+            colors.append(c)
+            tags.append(t)
+            occasions.append([o.lower() for o in occ])
+            price[i] = p.get("price") or 0
+
+            # 6) trendiness
+            if "viral" in t or "trending" in t or p.get("popularity", 0) > 80:
+                static[i] += 10
+            # 7) rating
+            rating = p.get("rating", 0)
+            if rating >= 4.5:
+                static[i] += 8
+            elif rating >= 4.0:
+                static[i] += 5
+            # 9) versatility
+            if len(t) >= 4:
+                static[i] += 6
+            elif len(t) >= 2:
+                static[i] += 3
+            # 10) style
+            if style in ["classic", "modern", "minimal"]:
+                static[i] += 4
+
+        self.titles = np.array(titles, dtype=str)
+        self.styles = np.array(styles, dtype=str)
+        self.genders = np.array(genders, dtype=str)
+        self.price = price
+        self.static = static
+
+        self.color_vocab, self.colors = self._matrix(colors)
+        self.tag_vocab, self.tags = self._matrix(tags)
+        self.occasion_vocab, self.occasions = self._matrix(occasions)
+
+        self.warm = self._any(self.colors, self.color_vocab, WARM_PALETTE)
+        self.cool = self._any(self.colors, self.color_vocab, COOL_PALETTE)
+
+    def __len__(self):
+        return len(self.products)
+
+    @staticmethod
+    def _matrix(rows):
+        vocab = {}
+        for r in rows:
+            for v in r:
+                vocab.setdefault(v, len(vocab))
+        m = np.zeros((len(rows), len(vocab)), dtype=bool)
+        for i, r in enumerate(rows):
+            for v in r:
+                m[i, vocab[v]] = True
+        return vocab, m
+
+    @staticmethod
+    def _any(matrix, vocab, values):
+        cols = [vocab[v] for v in values if v in vocab]
+        if not cols:
+            return np.zeros(matrix.shape[0], dtype=bool)
+        return matrix[:, cols].any(axis=1)
+
+    def column(self, which, value):
+        vocab, matrix = {
+            "colors": (self.color_vocab, self.colors),
+            "tags": (self.tag_vocab, self.tags),
+            "occasion": (self.occasion_vocab, self.occasions),
+        }[which]
+        j = vocab.get(value)
+        return matrix[:, j] if j is not None else np.zeros(len(self), dtype=bool)
+
+    def contains(self, which, needle):
+        """Substring test over a string column ('title' / 'style')."""
+        col = self.titles if which == "title" else self.styles
+        return np.char.find(col, needle) >= 0
+
+
 class OutfitScoreAgent:
     """
     Scores outfits (1–100) using improved dataset-aware smart logic:
@@ -12,6 +124,8 @@ class OutfitScoreAgent:
       - Rating boost
       - Budget fit
       - Versatility score
+    score() rates one product; score_batch() / score_many_users() apply
+    the same rules to a whole slice over a precomputed OutfitFeatures.
     """
 
     def __init__(self):
@@ -109,8 +223,9 @@ class OutfitScoreAgent:
         # 8) Budget fit
         # ------------------------------------------------
         price = product.get("price")
+        budget = as_range(budget)
         if budget and price:
-            if price <= budget:
+            if budget.contains(price):
                 score += 10
             else:
                 score -= 12
@@ -138,11 +253,108 @@ class OutfitScoreAgent:
         return score
 
 
+    # ----------------------------------------------------
+    # BATCH SCORING (same rules as score(), as array ops)
+    # ----------------------------------------------------
+    def featurize(self, products):
+        if isinstance(products, OutfitFeatures):
+            return products
+        return OutfitFeatures(products)
+
+    def _shared_terms(self, f, preferred_colors, budget, event):
+        """Components that depend only on the query, not on the user."""
+        s = np.zeros(len(f), dtype=np.int64)
+
+        # 1) preferred color (first color that hits wins → any)
+        if preferred_colors:
+            hit = np.zeros(len(f), dtype=bool)
+            for c in preferred_colors:
+                c = c.lower()
+                hit |= f.column("colors", c) | f.contains("title", c) | f.column("tags", c)
+            s += 15 * hit
+
+        # 4) event
+        if event:
+            e = event.lower()
+            exact = f.column("occasion", e)
+            partial = f.column("tags", e) | f.contains("title", e) | f.contains("style", e)
+            s += np.where(exact, 15, np.where(partial, 10, 0))
+
+        # 8) budget range (missing / zero price → no effect)
+        budget = as_range(budget)
+        if budget:
+            priced = f.price != 0
+            inside = np.ones(len(f), dtype=bool)
+            if budget.low is not None:
+                inside &= f.price >= budget.low
+            if budget.high is not None:
+                inside &= f.price <= budget.high
+            s += np.where(priced & inside, 10, 0)
+            s -= np.where(priced & ~inside, 12, 0)
+
+        return s
+
+    def score_batch(self, products, analysis, preferred_colors=None, budget=None, event=None):
+        """score() for every product at once → int64 vector clamped to 1–100."""
+        f = self.featurize(products)
+        s = f.static + self._shared_terms(f, preferred_colors, budget, event)
+
+        # 2) dominant image colors
+        dom = np.zeros(len(f), dtype=bool)
+        for dc in analysis.get("dominant_colors", []):
+            dom |= f.column("colors", dc.lower())
+        s += 12 * dom
+
+        # 3) skin tone harmony
+        skin = (analysis.get("skin_tone") or "").lower()
+        if skin in WARM_SKIN:
+            s += 10 * f.warm
+        elif skin in COOL_SKIN:
+            s += 10 * f.cool
+
+        # 5) gender
+        if analysis.get("gender"):
+            s += np.where(f.genders == analysis["gender"].lower(), 10, -10)
+
+        return np.clip(s, 1, 100)
+
+    def score_many_users(self, products, analyses, preferred_colors=None, budget=None, event=None):
+        """
+        One catalog slice × many user analyses → (U, N) score matrix.
+        User-dependent parts are matrix products over the shared
+        feature matrix; query parts are computed once for all users.
+        """
+        f = self.featurize(products)
+        u = len(analyses)
+        base = f.static + self._shared_terms(f, preferred_colors, budget, event)
+        s = np.tile(base, (u, 1))
+
+        # 2) dominant colors: (U, C) @ (C, N) > 0
+        want = np.zeros((u, len(f.color_vocab)), dtype=np.float32)
+        for i, a in enumerate(analyses):
+            for dc in a.get("dominant_colors", []):
+                j = f.color_vocab.get(dc.lower())
+                if j is not None:
+                    want[i, j] = 1.0
+        s += 12 * ((want @ f.colors.T.astype(np.float32)) > 0)
+
+        # 3) skin tone: per-user warm / cool flag × product palette hit
+        skins = [(a.get("skin_tone") or "").lower() for a in analyses]
+        warm = np.array([sk in WARM_SKIN for sk in skins])
+        cool = np.array([sk in COOL_SKIN for sk in skins])
+        s += 10 * (np.outer(warm, f.warm) | np.outer(cool, f.cool))
+
+        # 5) gender: ±10 only for users with a detected gender
+        ug = np.array([(a.get("gender") or "").lower() for a in analyses], dtype=str)
+        has = (ug != "")[:, None]
+        s += np.where(has, np.where(ug[:, None] == f.genders[None, :], 10, -10), 0)
+
+        return np.clip(s, 1, 100)
+
     def rank_products(self, products, analysis, preferred_colors=None, budget=None, event=None):
-        scored = []
-        for p in products:
-            s = self.score(p, analysis, preferred_colors, budget, event)
-            scored.append((s, p))
+        f = self.featurize(products)
+        scores = self.score_batch(f, analysis, preferred_colors, budget, event)
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [p for s, p in scored]
+        # stable: ties keep catalog order, like the old per-product sort
+        order = np.argsort(-scores, kind="stable")
+        return [f.products[i] for i in order]
@@ -0,0 +1,175 @@
+# popularity_signals.py (streaming, time-decayed popularity from ui_logs events)
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+
+from event_log import LogTail
+
+# interaction weights: an impression is one slot in a shown result list
+WEIGHTS = {"OUTPUT": 1.0, "CLICK": 5.0, "PURCHASE": 20.0}
+
+_MERSENNE = (1 << 61) - 1
+
+
+class DecayedCountMinSketch:
+    """
+    Count-min sketch of exponentially decayed counts.
+    - depth × width float64 table, fixed memory whatever the key count
+    - forward decay: an event at t adds w·e^{λ(t−t0)}; estimates divide
+      by e^{λ(now−t0)}, so nothing is touched when time passes
+    - the landmark t0 is moved forward (one table rescale) before the
+      exponent gets large
+    - updates / queries are vectorized over key batches
+    Keys are hashed with Python's hash(): estimates are only valid in
+    the process that built the sketch.
+    """
+
+    def __init__(self, width=1 << 16, depth=4, half_life_s=6 * 3600, seed=7):
+        self.width = width
+        self.depth = depth
+        self.rate = math.log(2) / half_life_s
+        self.table = np.zeros((depth, width), dtype=np.float64)
+        self.t0 = time.time()
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE, size=depth, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE, size=depth, dtype=np.uint64)
+
+    def _rows(self, keys):
+        h = np.fromiter((hash(k) for k in keys), dtype=np.int64, count=len(keys)).view(np.uint64)
+        h = (h ^ (h >> np.uint64(29))) & np.uint64(_MERSENNE)
+        # (a·h + b) mod p, one row per hash function (uint64 wraparound is fine here)
+        return ((self._a[:, None] * h[None, :] + self._b[:, None]) % np.uint64(_MERSENNE)
+                % np.uint64(self.width)).astype(np.int64)
+
+    def _rebase(self, now):
+        # keep e^{λ(t−t0)} well inside float range
+        if self.rate * (now - self.t0) > 30:
+            self.table *= math.exp(-self.rate * (now - self.t0))
+            self.t0 = now
+
+    def add_many(self, keys, weights, ts):
+        if not len(keys):
+            return
+        ts = np.asarray(ts, dtype=np.float64)
+        self._rebase(float(ts.max()))
+        scaled = np.asarray(weights, dtype=np.float64) * np.exp(self.rate * (ts - self.t0))
+        rows = self._rows(keys)
+        for d in range(self.depth):
+            self.table[d] += np.bincount(rows[d], weights=scaled, minlength=self.width)
+
+    def estimate_many(self, keys, now=None):
+        if not len(keys):
+            return np.zeros(0)
+        now = time.time() if now is None else now
+        rows = self._rows(keys)
+        est = self.table[np.arange(self.depth)[:, None], rows].min(axis=0)
+        return est * math.exp(-self.rate * (now - self.t0))
+
+
+class PopularityAggregator:
+    """
+    Folds ui_logs events into decayed popularity counters:
+      - [OUTPUT] events (with `ids`, `region`) → impressions
+      - [CLICK] / [PURCHASE] events (with `id`, `region`) → engagement
+    Counts go to one sketch keyed by product id and region|id.
+    refresh() turns them into 0–1 scores for TrendAgent.set_signals();
+    start() tails the event log from a (segment, byte offset) cursor —
+    each interval reads only the newly appended lines — and refreshes.
+    """
+
+    def __init__(self, half_life_s=6 * 3600, width=1 << 16, depth=4, batch_size=50000):
+        self.sketch = DecayedCountMinSketch(width, depth, half_life_s)
+        self.batch_size = batch_size
+        self.regions = set()
+        self.last_ts = None
+        self.events = 0
+        self.tail = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --------------------------------------------------
+    # Ingest
+    # --------------------------------------------------
+    def consume(self, events):
+        keys, weights, ts = [], [], []
+        for e in events:
+            w = WEIGHTS.get(e.get("tag"))
+            if w is None:
+                continue
+            ids = e.get("ids") if e.get("tag") == "OUTPUT" else [e.get("id")]
+            if not ids:
+                continue
+            t = e.get("ts", 0)
+            region = (e.get("region") or "").lower()
+            if region:
+                self.regions.add(region)
+            for pid in ids:
+                if pid is None:
+                    continue
+                keys.append(pid)
+                if region:
+                    keys.append(f"{region}|{pid}")
+            n = len(keys) - len(weights)
+            weights.extend([w] * n)
+            ts.extend([t] * n)
+            self.events += 1
+            if self.last_ts is None or t > self.last_ts:
+                self.last_ts = t
+
+            if len(keys) >= self.batch_size:
+                self._flush(keys, weights, ts)
+                keys, weights, ts = [], [], []
+        self._flush(keys, weights, ts)
+
+    def _flush(self, keys, weights, ts):
+        with self._lock:
+            self.sketch.add_many(keys, weights, ts)
+
+    # --------------------------------------------------
+    # Scores
+    # --------------------------------------------------
+    def scores(self, product_ids, region=None, now=None):
+        """{id: 0–1} decayed popularity, normalized by the top product."""
+        keys = [f"{region}|{pid}" if region else pid for pid in product_ids]
+        with self._lock:
+            est = self.sketch.estimate_many(keys, now)
+        top = est.max() if len(est) else 0.0
+        if top <= 0:
+            return {}
+        return {pid: float(v / top) for pid, v in zip(product_ids, est) if v > 0}
+
+    def refresh(self, trend_agent):
+        ids = [p.get("id") for p in trend_agent.products if p.get("id") is not None]
+        now = time.time()
+        regional = {r: self.scores(ids, region=r, now=now) for r in sorted(self.regions)}
+        trend_agent.set_signals(self.scores(ids, now=now), regional)
+        logging.info("[POPULARITY] Refreshed %s products, %s regions (%s events)",
+                     len(ids), len(regional), self.events)
+
+    # --------------------------------------------------
+    # Background tailing of ui_logs
+    # --------------------------------------------------
+    def start(self, log_path, get_trend_agent, interval_s=60):
+        """get_trend_agent: callable, so a catalog reload's new TrendAgent is used."""
+        self.tail = LogTail(log_path)
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.consume(self.tail.read())
+                    self.refresh(get_trend_agent())
+                except Exception:
+                    logging.exception("[POPULARITY] Refresh failed")
+                self._stop.wait(interval_s)
+
+        self._thread = threading.Thread(target=loop, name="popularity", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -1,4 +1,30 @@
+import argparse
+import hashlib
+import json
 import logging
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from agents.budget_agent import as_range
+from agents.outfit_score_agent import WARM_PALETTE, COOL_PALETTE, WARM_SKIN, COOL_SKIN
+from agents.query_analyzer import ANALYZER
+
+
+def segment_key(analysis):
+    """
+    (skin bucket, gender, dominant colors) — everything the user-side
+    bonuses depend on. Skin tones collapse to warm / cool and the color
+    bonus is "any of", so order and duplicates don't matter.
+    """
+    analysis = analysis or {}
+    skin = (analysis.get("skin_tone") or "").lower()
+    bucket = "warm" if skin in WARM_SKIN else "cool" if skin in COOL_SKIN else ""
+    gender = (analysis.get("gender") or "").lower()
+    colors = tuple(sorted({c.lower() for c in analysis.get("dominant_colors", [])}))
+    return bucket, gender, colors
+
 
 class ProductRecommenderAgent:
     """
@@ -7,24 +33,222 @@ class ProductRecommenderAgent:
       - OutfitScoreAgent concepts (color harmony, trend, rating)
       - EventAgent (occasion match)
       - RegionAgent (soft boost)
-      - BudgetAgent (budget fit)
-      - Keyword relevance
+      - BudgetAgent (price range fit)
+      - Keyword relevance (analyzed terms, token-boundary match)
       - User preferred colors
       - Popularity + rating core score
 
     Outputs the *best ranked* products for the UI.
+
+    Scoring is vectorized over catalog positions:
+      - static part (popularity, rating, trend, versatility) computed once
+      - segment part (skin palette, gender, dominant colors) is one
+        int16 vector per user segment, kept in an LRU and optionally
+        materialized offline (materialize / save_segments)
+      - query part (budget, region, keywords, event, templates,
+        preferred colors) computed per request on the candidates only
     """
 
-    def __init__(self, products):
+    def __init__(self, products, segment_cache=64):
         self.products = products or []
+        self.segment_cache = segment_cache
+        self._segments = OrderedDict()
+        self._featurize()
+
+    # --------------------------------------------------
+    # CATALOG FEATURES (once per catalog)
+    # --------------------------------------------------
+    def _featurize(self):
+        n = len(self.products)
+        self._pos = {id(p): i for i, p in enumerate(self.products)}
+
+        static = np.zeros(n, dtype=np.int32)
+        price = np.zeros(n, dtype=np.float64)
+        titles, tags_joined, categories, genders = [], [], [], []
+        self._colors, self._occasions = {}, {}
+        self._text_tokens, self._style_tokens = {}, {}
+
+        def post(table, key, i):
+            table.setdefault(key, []).append(i)
+
+        for i, p in enumerate(self.products):
+            title = p.get("title", "").lower()
+            category = (p.get("category") or "").lower()
+            style = (p.get("style") or "").lower()
+            tags_list = [t.lower() for t in p.get("tags", [])]
+            tags = " ".join(tags_list)
+            occ = p.get("occasion") or []
+            if isinstance(occ, str):
+                occ = [occ]
+
+            titles.append(title)
+            categories.append(category)
+            tags_joined.append(tags)
+            genders.append((p.get("gender") or "").lower())
+            price[i] = p.get("price") or 0
+
+            for c in {c.lower() for c in p.get("colors", [])}:
+                post(self._colors, c, i)
+            for o in {o.lower() for o in occ}:
+                post(self._occasions, o, i)
+            for t in set(ANALYZER.tokens(" ".join([title, category, tags]))):
+                post(self._text_tokens, t, i)
+            for t in set(ANALYZER.tokens(style)):
+                post(self._style_tokens, t, i)
+
+            # 1) Popularity + Rating (Core Weight)
+            static[i] = int(p.get("popularity", 0)) + int(p.get("rating", 0) * 10)
+            # 9) Trendiness Boost
+            if "viral" in tags_list or "trending" in tags_list:
+                static[i] += 10
+            # 10) More Tags → More Versatile
+            if len(tags_list) >= 4:
+                static[i] += 5
+
+        for table in (self._colors, self._occasions, self._text_tokens, self._style_tokens):
+            for k, v in table.items():
+                table[k] = np.array(v, dtype=np.int32)
+
+        self._static = static
+        self._price = price
+        self._titles = np.array(titles, dtype=str)
+        self._tags = np.array(tags_joined, dtype=str)
+        self._categories = np.array(categories, dtype=str)
+        self._genders = np.array(genders, dtype=str)
+        self._warm = self._any_color(WARM_PALETTE)
+        self._cool = self._any_color(COOL_PALETTE)
+
+    def _any_color(self, colors):
+        hit = np.zeros(len(self.products), dtype=bool)
+        for c in colors:
+            hit[self._colors.get(c, [])] = True
+        return hit
+
+    # --------------------------------------------------
+    # SEGMENT VECTORS (skin tone / gender / dominant colors)
+    # --------------------------------------------------
+    def segment_vector(self, analysis):
+        """Per-product user-side bonus, shared by every user in the segment."""
+        key = segment_key(analysis)
+        vec = self._segments.get(key)
+        if vec is not None:
+            self._segments.move_to_end(key)
+            return vec
+
+        bucket, gender, colors = key
+        vec = np.zeros(len(self.products), dtype=np.int16)
+        # 6) Dominant image colors
+        vec[self._any_color(colors)] += 7
+        # 7) SKIN TONE Matching
+        if bucket == "warm":
+            vec[self._warm] += 8
+        elif bucket == "cool":
+            vec[self._cool] += 8
+        # 8) Gender Alignment (from analysis)
+        if gender:
+            vec += np.where(self._genders == gender, 8, -6).astype(np.int16)
+
+        self._remember(key, vec)
+        return vec
+
+    def _remember(self, key, vec):
+        self._segments[key] = vec
+        self._segments.move_to_end(key)
+        while len(self._segments) > self.segment_cache:
+            self._segments.popitem(last=False)
+
+    def materialize(self, analyses):
+        """Precomputes the vectors for these analyses (profiles, a segment grid…)."""
+        keys = list(dict.fromkeys(segment_key(a) for a in analyses))
+        self.segment_cache = max(self.segment_cache, len(keys))
+        for bucket, gender, colors in keys:
+            self.segment_vector({"skin_tone": bucket, "gender": gender,
+                                 "dominant_colors": list(colors)})
+        return len(keys)
+
+    def segment_fingerprint(self):
+        """
+        Hash of everything the segment vectors are computed from: each
+        product's id, colors and gender, plus the warm / cool palettes.
+        Any change there (not just to the id list) makes saved vectors stale.
+        """
+        h = hashlib.sha1()
+        h.update(json.dumps([sorted(WARM_PALETTE), sorted(COOL_PALETTE)]).encode("utf-8"))
+        for i, p in enumerate(self.products):
+            row = [p.get("id", i), sorted({c.lower() for c in p.get("colors", [])}),
+                   (p.get("gender") or "").lower()]
+            h.update(json.dumps(row, default=str).encode("utf-8") + b"\n")
+        return h.hexdigest()
 
-    def rank(self, candidates, context=None):
+    def save_segments(self, path):
+        os.makedirs(path, exist_ok=True)
+        keys = list(self._segments)
+        vectors = np.stack([self._segments[k] for k in keys]) if keys else \
+            np.zeros((0, len(self.products)), dtype=np.int16)
+        np.save(os.path.join(path, "vectors.npy"), vectors)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "catalog": self.segment_fingerprint(),
+                "segments": [[b, g, list(c)] for b, g, c in keys],
+            }, f)
+
+    def load_segments(self, path):
+        """Memory-maps materialized vectors; skipped if built for another catalog."""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return 0
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["catalog"] != self.segment_fingerprint():
+            logging.warning("[RECOMMENDER] Segment vectors at %s are stale — rebuild them", path)
+            return 0
+
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.segment_cache = max(self.segment_cache, len(meta["segments"]) + 64)
+        for (b, g, c), vec in zip(meta["segments"], vectors):
+            self._remember((b, g, tuple(c)), vec)
+        logging.info("[RECOMMENDER] Loaded %s segment vectors", len(meta["segments"]))
+        return len(meta["segments"])
+
+    # --------------------------------------------------
+    # RANKING
+    # --------------------------------------------------
+    def _positions(self, candidates):
+        pos = [self._pos.get(id(p)) for p in candidates]
+        if any(i is None for i in pos):
+            return None
+        return np.array(pos, dtype=np.int64)
+
+    def rank(self, candidates, context=None, top_k=None):
         if not candidates:
             return []
 
+        s = self.scores(candidates, context)
+
+        # --------------------------------------------------
+        # RANKING: highest score first (ties keep candidate order)
+        # --------------------------------------------------
+        if top_k and top_k < len(s):
+            cut = -np.partition(-s, top_k - 1)[top_k - 1]
+            above = np.flatnonzero(s > cut)
+            ties = np.flatnonzero(s == cut)[:top_k - len(above)]
+            order = np.concatenate([above, ties])
+            order = order[np.argsort(-s[order], kind="stable")]
+        else:
+            order = np.argsort(-s, kind="stable")
+
+        return [candidates[i] for i in order]
+
+    def scores(self, candidates, context=None):
+        """int32 score per candidate (same order as `candidates`)."""
+        pos = self._positions(candidates)
+        if pos is None:
+            # products from outside this catalog: featurize them on the fly
+            return ProductRecommenderAgent(candidates).scores(candidates, context)
+
         ctx = context or {}
 
-        budget = ctx.get("budget")
+        budget = as_range(ctx.get("budget"))
         region = (ctx.get("region") or "").lower()
         user_text = (ctx.get("user_text") or "").lower()
         event = (ctx.get("event") or "").lower()
@@ -35,138 +259,98 @@ class ProductRecommenderAgent:
         ]
 
         analysis = ctx.get("analysis", {}) or {}
-        dominant_colors = [
-            c.lower() for c in analysis.get("dominant_colors", [])
-        ]
-        skin = (analysis.get("skin_tone") or "").lower()
+        key_words = ANALYZER.analyze(user_text)
 
-        key_words = user_text.split()
+        titles = self._titles[pos]
+        tags = self._tags[pos]
+        categories = self._categories[pos]
 
-        warm_palette = ["beige", "brown", "olive", "maroon", "rust", "mustard"]
-        cool_palette = ["blue", "grey", "black", "white", "navy", "silver"]
+        def has(col, needle):
+            return np.char.find(col, needle) >= 0
 
-        # --------------------------------------------------
-        # INTERNAL SCORING FUNCTION
-        # --------------------------------------------------
-        def score(p):
-            s = 0
+        def at(table, key):
+            # posting list → hit mask over the candidates
+            hit = np.zeros(len(self.products), dtype=bool)
+            hit[table.get(key, [])] = True
+            return hit[pos]
 
-            title = p.get("title", "").lower()
-            category = (p.get("category") or "").lower()
-            style = (p.get("style") or "").lower()
-            tags_list = [t.lower() for t in p.get("tags", [])]
-            tags = " ".join(tags_list)
-            colors = [c.lower() for c in p.get("colors", [])]
-            price = p.get("price")
-            gender = (p.get("gender") or "").lower()
+        # static (popularity, rating, trend, versatility) + user segment
+        s = self._static[pos] + self.segment_vector(analysis)[pos].astype(np.int32)
 
-            # -------------------------------------
-            # 1) Popularity + Rating (Core Weight)
-            # -------------------------------------
-            s += int(p.get("popularity", 0))
-            s += int(p.get("rating", 0) * 10)
-
-            # -------------------------------------
-            # 2) Budget Fit
-            # -------------------------------------
-            if budget and price:
-                if price <= budget:
-                    s += 25
-                else:
-                    s -= 20
-
-            # -------------------------------------
-            # 3) REGION Soft Match
-            # -------------------------------------
-            if region and region in tags:
-                s += 10
-
-            # -------------------------------------
-            # 4) Keyword Relevance (user_text)
-            # -------------------------------------
+        # -------------------------------------
+        # 2) Budget Fit
+        # -------------------------------------
+        if budget:
+            price = self._price[pos]
+            fits = np.ones(len(pos), dtype=bool)
+            if budget.low is not None:
+                fits &= price >= budget.low
+            if budget.high is not None:
+                fits &= price <= budget.high
+            s += np.where(price != 0, np.where(fits, 25, -20), 0).astype(np.int32)
+
+        # -------------------------------------
+        # 3) REGION Soft Match
+        # -------------------------------------
+        if region:
+            s += 10 * has(tags, region)
+
+        # -------------------------------------
+        # 4) Keyword Relevance (user_text)
+        # -------------------------------------
+        if key_words:
+            kw = np.zeros(len(self.products), dtype=np.int32)
             for w in key_words:
-                if w in title or w in tags or w in category:
-                    s += 6
-                if w in style:
-                    s += 4
-
-            # -------------------------------------
-            # 5) EVENT / Outfit Template Match
-            # -------------------------------------
-            if event:
-                # occasion match
-                occ = p.get("occasion") or []
-                if isinstance(occ, str):
-                    occ = [occ]
-                occ = [o.lower() for o in occ]
-
-                if event in occ:
-                    s += 15
-                elif event in title or event in tags or event in category:
-                    s += 10
-
-            # Outfit templates (from EventAgent or FaceBodyAgent)
+                kw[self._text_tokens.get(w, [])] += 6
+                kw[self._style_tokens.get(w, [])] += 4
+            s += kw[pos]
+
+        # -------------------------------------
+        # 5) EVENT / Outfit Template Match
+        # -------------------------------------
+        if event:
+            occ = at(self._occasions, event)
+            text = has(titles, event) | has(tags, event) | has(categories, event)
+            s += np.where(occ, 15, np.where(text, 10, 0)).astype(np.int32)
+
+        # Outfit templates (from EventAgent or FaceBodyAgent)
+        if outfit_templates:
+            hit = np.zeros(len(pos), dtype=bool)
             for ot in outfit_templates:
-                if ot in title or ot in tags or ot in category:
-                    s += 12
-                    break
-
-            # -------------------------------------
-            # 6) Color Match
-            # -------------------------------------
-            # Preferred by user
+                hit |= has(titles, ot) | has(tags, ot) | has(categories, ot)
+            s += 12 * hit
+
+        # -------------------------------------
+        # 6) Color Match (preferred by user)
+        # -------------------------------------
+        if preferred_colors:
+            hit = np.zeros(len(pos), dtype=bool)
             for pc in preferred_colors:
-                if pc in colors or pc in title:
-                    s += 10
-                    break
-
-            # Dominant image colors
-            for dc in dominant_colors:
-                if dc in colors:
-                    s += 7
-                    break
-
-            # -------------------------------------
-            # 7) SKIN TONE Matching
-            # -------------------------------------
-            if skin:
-                if skin in ["warm", "tan", "medium warm"]:
-                    if any(c in colors for c in warm_palette):
-                        s += 8
-                elif skin in ["cool", "fair", "light cool"]:
-                    if any(c in colors for c in cool_palette):
-                        s += 8
-
-            # -------------------------------------
-            # 8) Gender Alignment (from analysis)
-            # -------------------------------------
-            if analysis.get("gender"):
-                user_gender = analysis["gender"].lower()
-                if gender == user_gender:
-                    s += 8
-                else:
-                    s -= 6
-
-            # -------------------------------------
-            # 9) Trendiness Boost
-            # -------------------------------------
-            if "viral" in tags_list or "trending" in tags_list:
-                s += 10
+                hit |= at(self._colors, pc) | has(titles, pc)
+            s += 10 * hit
 
-            # -------------------------------------
-            # 10) More Tags → More Versatile
-            # -------------------------------------
-            if len(tags_list) >= 4:
-                s += 5
+        return s
 
-            # -------------------------------------
-            # FINAL SCORE
-            # -------------------------------------
-            return s
 
-        # --------------------------------------------------
-        # RANKING: highest score first
-        # --------------------------------------------------
-        ranked = sorted(candidates, key=lambda p: score(p), reverse=True)
+if __name__ == "__main__":
+    from profile_store import ProfileStore
+
+    parser = argparse.ArgumentParser(description="Materialize per-segment ranking vectors")
+    parser.add_argument("--products", default=os.path.join("data", "products.json"))
+    parser.add_argument("--profiles", default=os.path.join("data", "user_profiles.sqlite"))
+    parser.add_argument("--out", default=os.path.join("data", "segment_vectors"))
+    args = parser.parse_args()
+
+    with open(args.products, "r", encoding="utf-8") as f:
+        products = json.load(f)
+
+    reco = ProductRecommenderAgent(products)
+    # stored users' segments + the bare skin × gender grid
+    genders = sorted({(p.get("gender") or "").lower() for p in products} | {""})
+    segments = [{"skin_tone": s, "gender": g} for s in ("warm", "cool", "") for g in genders]
+    if os.path.exists(args.profiles):
+        segments += ProfileStore(args.profiles).analyses()
 
-        return ranked
+    count = reco.materialize(segments)
+    reco.save_segments(args.out)
+    print(f"Saved {count} segment vectors for {len(products)} products → {args.out}")
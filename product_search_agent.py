@@ -1,5 +1,13 @@
 import logging
 import re
+from operator import itemgetter
+
+import numpy as np
+
+from agents.budget_agent import as_range
+from agents.facet_index import FacetIndex
+from agents.query_analyzer import ANALYZER
+from agents.spell_index import SpellIndex
 
 class ProductSearchAgent:
     """
@@ -9,15 +17,29 @@ class ProductSearchAgent:
       - EventAgent templates
       - GiftAgent templates
       - category / tags / style / colors / material / gender / occasion
-      - budget filtering
-      - color filtering
-      - fit filtering
-      - preferred style matching
+      - price range (BudgetAgent PriceRange or a max price) / gender /
+        category / color / fit / style filtering as
+        precomputed facet bitmaps (FacetIndex), AND-ed before scoring
+      - typo tolerance: query terms missing from the catalog vocabulary
+        get a confident correction OR-ed in (SpellIndex); the typo itself
+        stays in the query and fixes are reported, not silently applied
       - region soft boosting
+      - optional dense retrieval (ANN over blob embeddings, facet mask
+        applied before its top-k cut) adding candidates to the keyword
+        postings
+      - QueryAnalyzer terms (stop/budget/region words dropped) matched on
+        token boundaries, so "a" or "me" no longer match every product
     """
 
-    def __init__(self, products):
+    def __init__(self, products, retriever=None, retrieve_k=200):
         self.products = products or []
+        self.retriever = retriever      # ProductEmbeddingIndex or None
+        self.retrieve_k = retrieve_k
+        self._tokens = {}               # id(product) → frozenset of blob tokens
+        self.facets = FacetIndex(self.products, blob=self._product_blob)
+        self.spell = SpellIndex.from_counts(
+            {t: len(pos) for t, pos in self.facets.postings.items()}
+        )
 
     # ----------------------------------------------------------
     # Build a search blob for each product
@@ -47,98 +69,133 @@ class ProductSearchAgent:
         blob = " ".join(parts).lower()
         return blob
 
+    def _product_tokens(self, p):
+        toks = self._tokens.get(id(p))
+        if toks is None:
+            toks = self._tokens[id(p)] = frozenset(ANALYZER.tokens(self._product_blob(p)))
+        return toks
+
     # ----------------------------------------------------------
-    # Keyword match (multi-keyword, fuzzy)
+    # Keyword match (any analyzed term, on token boundaries)
     # ----------------------------------------------------------
-    def _keyword_match(self, product, keywords):
+    def _keyword_match(self, product, keywords, terms=None):
         if not keywords:
             return True
 
-        blob = self._product_blob(product)
-        k = keywords.lower().strip()
-
-        # Exact
-        if k in blob:
+        terms = ANALYZER.analyze(keywords) if terms is None else terms
+        if not terms:
+            # nothing but stop/budget/region words → other filters decide
             return True
 
-        # Word-by-word fuzzy
-        for w in k.split():
-            if w in blob:
-                return True
-
-        return False
+        toks = self._product_tokens(product)
+        return any(w in toks for w in terms)
 
     # ----------------------------------------------------------
     # MAIN SEARCH FUNCTION
     # ----------------------------------------------------------
-    def search(self, keywords="", budget=None, region=None, color=None, fit=None, preferred=None):
+    def search(self, keywords="", budget=None, region=None, color=None, fit=None, preferred=None,
+               gender=None, category=None, keyed=False, corrections=None):
+        """
+        Matching products, best first. keyed=True returns (sort key,
+        product) pairs instead — what a shard coordinator merges on.
+        `corrections` (dict) receives the {typo: fix} spelling fixes used.
+        """
         logging.info("[SEARCH_AGENT] Running enhanced search")
 
         k = (keywords or "").lower().strip()
-        key_words = k.split() if k else []
+        key_words = ANALYZER.analyze(k) if k else []
+
+        # "kurthi" / "lehnga" from voice transcripts → catalog terms
+        key_words, fixes = self.spell.correct(key_words)
+        if fixes:
+            logging.info(f"[SEARCH_AGENT] Corrected terms: {fixes}")
+            k = k + " " + " ".join(fixes.values())
+            if corrections is not None:
+                corrections.update(fixes)
 
         region = (region or "").lower().strip() or None
         color = (color or "").lower().strip()
         preferred = (preferred or "").lower().strip()
         fit = (fit or "").lower().strip()
 
-        matched = []
-
-        for p in self.products:
-            blob = self._product_blob(p)
-            price = p.get("price")
-
-            # ------------------------------------------
-            # Budget Filter
-            # ------------------------------------------
-            if budget and price and price > budget:
-                continue
-
-            # ------------------------------------------
-            # Keyword match
-            # ------------------------------------------
-            if k and not self._keyword_match(p, k):
-                continue
-
-            # ------------------------------------------
-            # Color filter
-            # ------------------------------------------
-            if color:
-                prod_colors = [c.lower() for c in p.get("colors", [])]
-                if color not in prod_colors and color not in blob:
-                    continue
-
-            # ------------------------------------------
-            # Fit filter (slim / casual / regular etc.)
-            # ------------------------------------------
-            if fit and fit not in blob:
-                continue
-
-            # ------------------------------------------
-            # Preferred style (minimal, classic, modern…)
-            # ------------------------------------------
-            if preferred and preferred not in blob:
-                continue
-
-            matched.append(p)
+        # ------------------------------------------
+        # Facet pre-filter: every filter is a bitmap, combined with &
+        # before any per-product Python runs
+        # ------------------------------------------
+        idx = self.facets
+        mask = idx.all()
+
+        # Price range (sorted price array → one contiguous slice); soft
+        # ranges ("around 2000") only boost relevance below
+        budget = as_range(budget)
+        if budget and budget.hard:
+            mask &= idx.price_between(budget.low, budget.high)
+
+        # Gender / category facets
+        if gender:
+            mask &= idx.facet("gender", gender)
+        if category:
+            mask &= idx.facet("category", category)
+
+        # Color: tagged color OR color word anywhere in the blob
+        if color:
+            mask &= idx.facet("colors", color) | idx.all_tokens(color)
+
+        # Fit (slim / casual / regular etc.)
+        if fit:
+            mask &= idx.all_tokens(fit)
+
+        # Preferred style (minimal, classic, modern…)
+        if preferred:
+            mask &= idx.facet("style", preferred) | idx.all_tokens(preferred)
+
+        # ------------------------------------------
+        # Candidate generation: keyword postings AND-ed with the facet
+        # mask; with an embedding index loaded, its top-k among the
+        # products passing the facets (synonyms the postings miss) is
+        # OR-ed in, so dense retrieval only ever adds recall
+        # ------------------------------------------
+        semantic = []
+        if k and self.retriever is not None:
+            try:
+                semantic = self.retriever.search(k, self.retrieve_k, allowed=mask)
+            except Exception:
+                logging.exception("[SEARCH_AGENT] Embedding retrieval failed → keyword scan")
+
+        if key_words:
+            mask &= idx.any_terms(key_words)
+        elif semantic:
+            # no content words: the ANN hits stand in for "everything"
+            mask = np.zeros_like(mask)
+        if semantic:
+            mask[semantic] = True
+        positions = np.flatnonzero(mask).tolist()
+
+        matched = [self.products[i] for i in positions]
 
         # -----------------------------------------------------
         # Scoring & Ranking Logic
         # -----------------------------------------------------
+        reg_tokens = ANALYZER.tokens(region) if region else []
+
         def relevance_score(p, reg=region):
-            blob = self._product_blob(p)
+            toks = self._product_tokens(p)
             score = 0
 
             # Keyword relevance
             for w in key_words:
-                if w in blob:
+                if w in toks:
                     score += 1
 
             # Region soft boost
             if reg:
-                if reg in blob:
+                if all(w in toks for w in reg_tokens):
                     score += 1
 
+            # Soft price target
+            if budget and not budget.hard and p.get("price") and budget.contains(p["price"]):
+                score += 1
+
             return score
 
         # FINAL SORT ORDER:
@@ -146,13 +203,19 @@ class ProductSearchAgent:
         #   2) popularity desc
         #   3) rating desc
         #   4) price asc
-        matched.sort(
-            key=lambda x: (
-                -relevance_score(x),
-                -x.get("popularity", 0),
-                -x.get("rating", 0),
-                x.get("price", 999999)
-            )
+        ranked = sorted(
+            ((
+                (
+                    -relevance_score(x),
+                    -x.get("popularity", 0),
+                    -x.get("rating", 0),
+                    x.get("price", 999999)
+                ),
+                x
+            ) for x in matched),
+            key=itemgetter(0)
         )
 
-        return matched
+        if keyed:
+            return ranked
+        return [x for _, x in ranked]
@@ -0,0 +1,163 @@
+# profile_store.py (persistent per-user profiles: SQLite + in-memory LRU)
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_id TEXT PRIMARY KEY,
+    data    TEXT NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+# analysis fields worth remembering across sessions
+ANALYSIS_KEYS = ("skin_tone", "dominant_colors", "gender", "outfit_recommendations")
+
+
+def empty_profile():
+    return {"analysis": {}, "color_counts": {}, "preferred_colors": [], "price_band": None}
+
+
+class ProfileStore:
+    """
+    User profiles keyed by user_id.
+    - SQLite (WAL) is the durable tier: one row of JSON per user
+    - an LRU OrderedDict is the hot tier: get() is a dict lookup for
+      active users, one primary-key read otherwise
+    - the connection is opened per process (safe with forked workers)
+    - updates re-read the row inside one BEGIN IMMEDIATE transaction, so
+      concurrent processes merge instead of overwriting each other from
+      their own (possibly stale) LRU
+    Profile: latest image analysis, preferred colors (most mentioned),
+    price band (last explicit budget range).
+    """
+
+    def __init__(self, path, cache_size=1024, top_colors=3):
+        self.path = path
+        self.cache_size = cache_size
+        self.top_colors = top_colors
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn_pid = None
+        self._db = None
+
+    def _conn(self):
+        if self._db is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # autocommit: transactions are opened explicitly (BEGIN IMMEDIATE)
+            self._db = sqlite3.connect(self.path, timeout=5, check_same_thread=False,
+                                       isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(_SCHEMA)
+            self._conn_pid = os.getpid()
+            self._cache.clear()
+        return self._db
+
+    # --------------------------------------------------
+    # Read / write
+    # --------------------------------------------------
+    def get(self, user_id):
+        with self._lock:
+            db = self._conn()
+            profile = self._cache.get(user_id)
+            if profile is not None:
+                self._cache.move_to_end(user_id)
+                return profile
+
+            row = db.execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+            profile = json.loads(row[0]) if row else empty_profile()
+            self._remember(user_id, profile)
+            return profile
+
+    def put(self, user_id, profile):
+        with self._lock:
+            self._write(self._conn(), user_id, profile)
+            self._remember(user_id, profile)
+
+    @staticmethod
+    def _write(db, user_id, profile):
+        db.execute(
+            "INSERT OR REPLACE INTO profiles (user_id, data, updated) VALUES (?, ?, ?)",
+            (user_id, json.dumps(profile, ensure_ascii=False), time.time()),
+        )
+
+    def _update(self, user_id, change):
+        """Read-modify-write of one profile in a single write transaction."""
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT data FROM profiles WHERE user_id = ?", (user_id,)).fetchone()
+                profile = json.loads(row[0]) if row else empty_profile()
+                change(profile)
+                self._write(db, user_id, profile)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self._remember(user_id, profile)
+
+    def _remember(self, user_id, profile):
+        self._cache[user_id] = profile
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # --------------------------------------------------
+    # Updates from requests
+    # --------------------------------------------------
+    def update_analysis(self, user_id, analysis):
+        if not analysis:
+            return
+        kept = {k: analysis[k] for k in ANALYSIS_KEYS if analysis.get(k)}
+        self._update(user_id, lambda profile: profile.update(analysis=kept))
+
+    def observe_query(self, user_id, colors=None, price_range=None):
+        """Colors mentioned in the query and its explicit budget range."""
+        if not colors and not price_range:
+            return
+
+        def change(profile):
+            if colors:
+                counts = Counter(profile.get("color_counts") or {})
+                counts.update(colors)
+                profile["color_counts"] = dict(counts)
+                profile["preferred_colors"] = [c for c, _ in counts.most_common(self.top_colors)]
+            if price_range:
+                profile["price_band"] = [price_range.low, price_range.high]
+
+        self._update(user_id, change)
+
+    def analyses(self):
+        """Stored image analyses of every user (offline segment materialization)."""
+        with self._lock:
+            rows = self._conn().execute("SELECT data FROM profiles").fetchall()
+        return [a for a in (json.loads(r[0]).get("analysis") for r in rows) if a]
+
+    def import_legacy(self, user_id, json_path):
+        """Seeds `user_id` from the old single-user user_profile.json once."""
+        if not os.path.exists(json_path):
+            return
+        with self._lock:
+            exists = self._conn().execute(
+                "SELECT 1 FROM profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if exists:
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception:
+            logging.exception("[PROFILE] Cannot read %s", json_path)
+            return
+        profile = empty_profile()
+        profile["analysis"] = {k: legacy[k] for k in ANALYSIS_KEYS if legacy.get(k)}
+        profile["preferred_colors"] = [c.lower() for c in legacy.get("preferred_colors", [])]
+        self.put(user_id, profile)
+        logging.info("[PROFILE] Imported %s → %s", json_path, user_id)
@@ -0,0 +1,122 @@
+# agents/query_analyzer.py (tokenization + stop-words for search and ranking)
+import argparse
+import json
+import os
+import re
+
+from agents.event_agent import EVENT_MAP, FUZZY_KEYWORD_MAP
+from agents.region_agent import RegionAgent
+
+# words like "co-ord", "women's", "t-shirt" stay one token
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:['\-][a-z0-9]+)*")
+
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "at", "by", "with",
+    "for", "from", "as", "is", "are", "be", "it", "its", "this", "that", "these",
+    "i", "me", "my", "mine", "we", "our", "you", "your", "he", "him", "his",
+    "she", "her", "they", "them", "their",
+    "show", "find", "get", "give", "want", "need", "looking", "look", "search",
+    "suggest", "suggestion", "suggestions", "recommend", "please", "can", "could",
+    "would", "some", "something", "any", "good", "best", "nice", "new", "buy",
+    "what", "which", "wear", "outfit", "outfits", "item", "items", "like", "also",
+}
+
+# budget phrasing — the number itself is parsed by BudgetAgent
+BUDGET_WORDS = {
+    "under", "below", "less", "than", "within", "upto", "up", "max", "maximum",
+    "budget", "cheap", "affordable", "price", "priced", "cost", "rs", "inr",
+    "rupee", "rupees", "k", "thousand", "around", "between",
+}
+
+_NUMBER_RE = re.compile(r"^\d+(?:\.\d+)?k?$")
+
+
+def _stem(w):
+    # light plural folding, applied to query AND product tokens
+    if len(w) > 3 and w.endswith("s") and not w.endswith("ss"):
+        return w[:-1]
+    return w
+
+
+def _region_words():
+    words = set(RegionAgent.FUZZY)
+    for names in RegionAgent.REGION_MAP.values():
+        words.update(names)
+    words.update(RegionAgent.REGION_MAP)
+    return words
+
+
+def _event_trigger_words():
+    # slang/synonyms that only EventAgent understands ("shaadi", "bday", "job"…);
+    # canonical event names and template words stay searchable as occasions
+    keep = set(EVENT_MAP) | {w for terms in EVENT_MAP.values() for t in terms for w in t.split()}
+    return {w for t in FUZZY_KEYWORD_MAP for w in t.split()} - keep
+
+
+class QueryAnalyzer:
+    """
+    Turns a user utterance into search terms:
+      - lowercase tokenization on token boundaries
+      - stop-word removal ("a", "me", "for", "my", "show"…)
+      - budget token stripping (numbers, currency, "under", "k"…)
+      - region token stripping (handled by RegionAgent instead)
+      - event trigger stripping (handled by EventAgent instead)
+      - light plural folding
+    Product text goes through tokens() so both sides match exactly.
+    """
+
+    def __init__(self):
+        self.region_phrases = sorted(
+            (w for w in _region_words() if " " in w), key=len, reverse=True
+        )
+        self.drop = STOP_WORDS | BUDGET_WORDS | _event_trigger_words() | {
+            w for w in _region_words() if " " not in w
+        }
+
+    def tokens(self, text):
+        return [_stem(w) for w in _TOKEN_RE.findall((text or "").lower())]
+
+    def analyze(self, text):
+        t = (text or "").lower().replace("₹", " ").replace("$", " ")
+        for phrase in self.region_phrases:
+            if phrase in t:
+                t = t.replace(phrase, " ")
+
+        terms = []
+        for w in _TOKEN_RE.findall(t):
+            if w in self.drop or _NUMBER_RE.match(w):
+                continue
+            w = _stem(w)
+            if w not in terms:
+                terms.append(w)
+        return terms
+
+
+ANALYZER = QueryAnalyzer()
+
+
+if __name__ == "__main__":
+    # Benchmark: candidate set size, old substring matcher vs analyzer
+    from agents.product_search_agent import ProductSearchAgent
+
+    parser = argparse.ArgumentParser(description="Candidate-count benchmark")
+    parser.add_argument("queries", nargs="*", default=[
+        "show me a shirt for my date under 500",
+        "black jeans for delhi",
+        "i want a dress for my sister",
+        "formal shoes under 2k",
+        "kurta for a wedding in punjab",
+    ])
+    parser.add_argument("--products", default=os.path.join("data", "products.json"))
+    args = parser.parse_args()
+
+    with open(args.products, "r", encoding="utf-8") as f:
+        products = json.load(f)
+    agent = ProductSearchAgent(products)
+
+    print(f"{'query':45s} {'substring':>10s} {'analyzer':>10s}  terms")
+    for q in args.queries:
+        old = sum(1 for p in products
+                  if q in agent._product_blob(p) or any(w in agent._product_blob(p) for w in q.split()))
+        new = sum(1 for p in products if agent._keyword_match(p, q))
+        print(f"{q[:45]:45s} {old:10d} {new:10d}  {ANALYZER.analyze(q)}")
@@ -0,0 +1,99 @@
+# query_cache.py (result cache keyed by normalized query intent)
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# currency / filler tokens that don't change intent once budget is parsed
+_NOISE = {"rs", "inr", "rupees", "rupee", "k", "thousand"}
+
+
+def normalize_tokens(text):
+    """
+    'jeans under' / 'Jeans, under' → ('jeans', 'under'). `text` comes
+    without its budget phrase (BudgetAgent.split), so every number left
+    is intent ('size 32 jeans' ≠ 'size 34 jeans'). Words are runs of
+    letters, digits and combining marks in any script, so Devanagari
+    queries keep their words (matras included).
+    """
+    chars = [c if c.isalnum() or unicodedata.category(c)[0] == "M" else " "
+             for c in (text or "").lower()]
+    return tuple(sorted({w for w in "".join(chars).split() if w not in _NOISE}))
+
+
+def analysis_fingerprint(analysis):
+    """Stable short hash of the image-analysis fields that affect results."""
+    if not analysis:
+        return None
+    keep = {k: analysis.get(k) for k in (
+        "skin_tone", "gender", "dominant_colors", "outfit_recommendations",
+    )}
+    raw = json.dumps(keep, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def profile_fingerprint(profile):
+    """Hash of the profile fields that personalize ranking (None → shared)."""
+    if not profile:
+        return None
+    keep = {k: profile.get(k) for k in ("analysis", "preferred_colors", "price_band")}
+    raw = json.dumps(keep, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def intent_key(route, text, event=None, region=None, budget=None, analysis=None, profile=None):
+    """`text` without the budget phrase; `budget` is the PriceRange read from it."""
+    return (route, event, region, budget, normalize_tokens(text), analysis_fingerprint(analysis),
+            profile_fingerprint(profile))
+
+
+class QueryCache:
+    """
+    TTL + LRU cache of ranked product IDs per query intent.
+    - stores IDs (not product dicts) → small entries, always-fresh products
+    - every entry is tagged with the catalog version; a version bump
+      invalidates everything
+    """
+
+    def __init__(self, max_entries=10000, ttl_s=600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()   # key → (expires_at, ids, note, extras)
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self.version:
+                self._data.clear()
+                self.version = version
+
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2], entry[3]
+
+    def put(self, key, version, ids, note=None, extras=None):
+        with self._lock:
+            if version != self.version:
+                self._data.clear()
+                self.version = version
+
+            self._data[key] = (time.monotonic() + self.ttl_s, tuple(ids), note, extras or {})
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -6,6 +6,7 @@ def route(text: str):
     """
     Improved routing logic:
       - Detects image intent
+      - Complete-the-look outfits
       - Event detection
       - Trend queries
       - Budget queries
@@ -25,6 +26,14 @@ def route(text: str):
         logging.info("[ROUTER] → vision")
         return "vision"
 
+    # ---------------------
+    # Complete-the-look (whole outfits, may mention an event)
+    # ---------------------
+    if any(w in t for w in ["complete the look", "complete look", "full outfit", "complete outfit",
+                            "whole outfit", "full look", "head to toe"]):
+        logging.info("[ROUTER] → outfit")
+        return "outfit"
+
     # ---------------------
     # Event routing
     # ---------------------
@@ -39,6 +48,13 @@ def route(text: str):
         logging.info("[ROUTER] → trend")
         return "trend"
 
+    # ---------------------
+    # Gift routing (before budget: "gift for mom under 3000" is a gift)
+    # ---------------------
+    if any(w in t for w in ["gift", "present", "surprise", "for him", "for her"]):
+        logging.info("[ROUTER] → gift")
+        return "gift"
+
     # ---------------------
     # Budget routing
     # ---------------------
@@ -46,13 +62,6 @@ def route(text: str):
         logging.info("[ROUTER] → budget")
         return "budget"
 
-    # ---------------------
-    # Gift routing
-    # ---------------------
-    if any(w in t for w in ["gift", "present", "surprise", "for him", "for her"]):
-        logging.info("[ROUTER] → gift")
-        return "gift"
-
     # ---------------------
     # Region routing (new)
     # ---------------------
@@ -1,18 +1,56 @@
 # agents/speech_agent.py
 import logging, os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+
+from agents.speech_stream import (
+    CALIBRATION_S, EnergyVAD, MicrophoneChunks, calibrate_threshold,
+)
+from agents.stt_backends import GoogleBackend, GroqWhisperBackend, make_backend
 
 class SpeechAgent:
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, client=None, sample_rate=16000, upload_format="flac",
+                 backend=None):
+        """
+        client        : transcription client (Groq-compatible:
+                        client.audio.transcriptions.create) — e.g. a local fake
+        sample_rate   : audio is downsampled to this rate before upload
+        upload_format : "flac" (smaller, needs the flac encoder) or "wav"
+        backend       : STT engine name or STTBackend tried first, e.g.
+                        "faster-whisper" / "vosk" for offline use
+                        (default: $STT_BACKEND, else Groq → Google)
+        """
         self.debug = debug
+        self.sample_rate = sample_rate
+        self.upload_format = upload_format
+
+        # ambient-noise calibration is done once and cached
+        self._recognizer = None
+        self._vad_threshold = None
+
+        # Engine chain, tried in order
+        self.backends = []
+
+        backend = backend or os.getenv("STT_BACKEND")
+        if backend:
+            try:
+                self.backends.append(
+                    make_backend(backend) if isinstance(backend, str) else backend
+                )
+            except Exception:
+                logging.exception("[STT] Backend %s not available.", backend)
 
         # Load Groq STT if available
         try:
-            from groq import Groq
-            self.groq = Groq(api_key=os.getenv("GROQ_API_KEY"))
+            self.backends.append(GroqWhisperBackend(
+                client=client, sample_rate=sample_rate, upload_format=upload_format
+            ))
         except Exception:
-            self.groq = None
             logging.info("[STT] Groq API not available, using fallback STT.")
 
+        self.backends.append(GoogleBackend())
+
     # ------------------------------------------------------
     # RECORD AUDIO
     # ------------------------------------------------------
@@ -23,11 +61,16 @@ class SpeechAgent:
         """
         try:
             import speech_recognition as sr
-            r = sr.Recognizer()
 
             with sr.Microphone() as source:
-                r.adjust_for_ambient_noise(source, duration=0.6)
-                audio = r.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+                if self._recognizer is None:
+                    r = sr.Recognizer()
+                    r.adjust_for_ambient_noise(source, duration=0.6)
+                    r.dynamic_energy_threshold = False
+                    self._recognizer = r
+                audio = self._recognizer.listen(
+                    source, timeout=timeout, phrase_time_limit=phrase_time_limit
+                )
                 return audio
 
         except Exception:
@@ -39,42 +82,94 @@ class SpeechAgent:
     # ------------------------------------------------------
     def audio_to_text(self, audio):
         """
-        Converts captured audio into text using:
+        Converts captured audio into text using the backend chain:
+            0) configured backend (e.g. local faster-whisper / Vosk)
             1) Groq Whisper (if available)
             2) Google STT via SpeechRecognition as fallback
         """
         if not audio:
             return None
 
-        # --- GROQ WHISPER STT ---
-        if self.groq:
+        for backend in self.backends:
             try:
-                import tempfile
+                text = backend.transcribe(audio)
+                if text:
+                    return text.strip()
+            except Exception:
+                logging.exception("[STT] %s failed — fallback.", backend.name)
 
-                # Save temporary wav
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                    tmp.write(audio.get_wav_data())
-                    temp_path = tmp.name
+        return None
 
-                # Read back file and send to API
-                with open(temp_path, "rb") as f:
-                    resp = self.groq.audio.transcriptions.create(
-                        file=(temp_path, f.read()),
-                        model="whisper-large-v3"
-                    )
+    def transcribe_files(self, paths):
+        """Batch transcription of recorded WAV queries with the first backend."""
+        return self.backends[0].transcribe_batch(paths)
 
-                text = getattr(resp, "text", None)
-                if text:
-                    return text.strip()
+    # ------------------------------------------------------
+    # STREAMING CAPTURE (VAD segments → STT while speaking)
+    # ------------------------------------------------------
+    def iter_transcripts(self, source=None, chunk_ms=30, timeout=6,
+                         max_duration=12, turn_silence_s=1.0):
+        """
+        Yields transcribed text per speech segment, in order.
+        Segments are cut by an energy VAD and sent to STT as soon as they
+        end, so transcription overlaps the rest of the utterance.
+        `source` is any iterable of 16-bit mono PCM frames (default: the
+        microphone; WavFileChunks replays a recording).
+        """
+        import speech_recognition as sr
 
-            except Exception:
-                logging.exception("[STT] Groq Whisper failed — fallback.")
+        source = source or MicrophoneChunks(self.sample_rate, chunk_ms)
+        rate = getattr(source, "sample_rate", self.sample_rate)
+        frames = iter(source)
+
+        if self._vad_threshold is None:
+            # the calibration frames are replayed into the VAD: a user who
+            # starts talking right away keeps their first words
+            warmup = list(islice(frames, max(1, int(CALIBRATION_S * 1000 / chunk_ms))))
+            self._vad_threshold = calibrate_threshold(warmup, chunk_ms=chunk_ms)
+            frames = chain(warmup, frames)
+
+        vad = EnergyVAD(self._vad_threshold, chunk_ms=chunk_ms)
+        pending = deque()
+        frame_s = chunk_ms / 1000.0
+        elapsed = quiet = 0.0
+        heard = False
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            for frame in frames:
+                elapsed += frame_s
+                seg = vad.feed(frame)
+                if seg:
+                    heard = True
+                    pending.append(pool.submit(self.audio_to_text, sr.AudioData(seg, rate, 2)))
 
-        # --- SPEECHRECOGNITION FALLBACK ---
+                while pending and pending[0].done():
+                    text = pending.popleft().result()
+                    if text:
+                        yield text
+
+                quiet = 0.0 if vad.in_speech else quiet + frame_s
+                if heard and quiet >= turn_silence_s:
+                    break
+                if not heard and not vad.in_speech and elapsed >= timeout:
+                    break
+                if elapsed >= timeout + max_duration:
+                    break
+
+            seg = vad.flush()
+            if seg:
+                pending.append(pool.submit(self.audio_to_text, sr.AudioData(seg, rate, 2)))
+
+            while pending:
+                text = pending.popleft().result()
+                if text:
+                    yield text
+
+    def stream_transcribe(self, source=None, **kwargs):
+        """Full utterance text from streaming capture (None if nothing heard)."""
         try:
-            import speech_recognition as sr
-            r = sr.Recognizer()
-            return r.recognize_google(audio)
+            parts = list(self.iter_transcripts(source, **kwargs))
         except Exception:
-            logging.exception("[STT] Google STT failed.")
-            return None
\ No newline at end of file
+            logging.info("[STT] Streaming capture not available — typing mode.")
+            return None
+        return " ".join(parts).strip() or None
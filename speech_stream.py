@@ -0,0 +1,127 @@
+# speech_stream.py (chunked capture + energy VAD for streaming STT)
+import logging
+import wave
+
+import numpy as np
+
+# ambient noise sampled before the first streamed utterance
+CALIBRATION_S = 0.6
+
+
+def frame_rms(frame):
+    """RMS energy of a 16-bit mono PCM frame."""
+    x = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+    if not x.size:
+        return 0.0
+    return float(np.sqrt(np.mean(x * x)))
+
+
+# ----------------------------------------------------------
+# CHUNK SOURCES (16-bit mono PCM)
+# ----------------------------------------------------------
+class MicrophoneChunks:
+    """Live microphone frames via SpeechRecognition/PyAudio."""
+
+    def __init__(self, sample_rate=16000, chunk_ms=30):
+        self.sample_rate = sample_rate
+        self.chunk = int(sample_rate * chunk_ms / 1000)
+
+    def __iter__(self):
+        import speech_recognition as sr
+        with sr.Microphone(sample_rate=self.sample_rate, chunk_size=self.chunk) as source:
+            while True:
+                yield source.stream.read(self.chunk)
+
+
+class WavFileChunks:
+    """Recorded WAV played back as if it were the microphone (offline tests)."""
+
+    def __init__(self, path, chunk_ms=30):
+        self.path = path
+        self.chunk_ms = chunk_ms
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2:
+                raise ValueError("WavFileChunks expects 16-bit PCM")
+            self.sample_rate = w.getframerate()
+            self.channels = w.getnchannels()
+
+    def __iter__(self):
+        n = int(self.sample_rate * self.chunk_ms / 1000)
+        with wave.open(self.path, "rb") as w:
+            while True:
+                frame = w.readframes(n)
+                if not frame:
+                    return
+                if self.channels > 1:
+                    x = np.frombuffer(frame, dtype=np.int16).reshape(-1, self.channels)
+                    frame = x.mean(axis=1).astype(np.int16).tobytes()
+                yield frame
+
+
+# ----------------------------------------------------------
+# ENERGY VAD / ENDPOINT DETECTOR
+# ----------------------------------------------------------
+class EnergyVAD:
+    """
+    Splits a frame stream into speech segments.
+    - a frame is speech when its RMS exceeds `threshold`
+    - a segment opens after `min_speech_ms` of speech (with pre-roll)
+    - it closes after `end_silence_ms` of silence or `max_segment_s`
+    feed() returns the finished segment's PCM bytes, else None.
+    """
+
+    def __init__(self, threshold, chunk_ms=30, min_speech_ms=90,
+                 end_silence_ms=450, max_segment_s=6.0, pre_roll_ms=150):
+        self.threshold = threshold
+        self.min_speech = max(1, int(min_speech_ms / chunk_ms))
+        self.end_silence = max(1, int(end_silence_ms / chunk_ms))
+        self.max_frames = int(max_segment_s * 1000 / chunk_ms)
+        self.pre_roll = max(1, int(pre_roll_ms / chunk_ms))
+        self.reset()
+
+    def reset(self):
+        self._frames = []
+        self._recent = []
+        self._voiced_run = 0
+        self._silent_run = 0
+        self.in_speech = False
+
+    def feed(self, frame):
+        voiced = frame_rms(frame) > self.threshold
+
+        if not self.in_speech:
+            self._recent.append(frame)
+            self._recent = self._recent[-(self.pre_roll + self.min_speech):]
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.min_speech:
+                self.in_speech = True
+                self._frames = list(self._recent)
+                self._recent = []
+                self._silent_run = 0
+            return None
+
+        self._frames.append(frame)
+        self._silent_run = 0 if voiced else self._silent_run + 1
+
+        if self._silent_run >= self.end_silence or len(self._frames) >= self.max_frames:
+            return self.flush()
+        return None
+
+    def flush(self):
+        seg = b"".join(self._frames) if self.in_speech else None
+        self.reset()
+        return seg
+
+
+def calibrate_threshold(chunks, duration_s=CALIBRATION_S, chunk_ms=30, multiplier=2.5, floor=150.0):
+    """Energy threshold from the ambient noise in the first `duration_s`."""
+    n = max(1, int(duration_s * 1000 / chunk_ms))
+    levels = []
+    for frame in chunks:
+        levels.append(frame_rms(frame))
+        if len(levels) >= n:
+            break
+    ambient = float(np.median(levels)) if levels else 0.0
+    threshold = max(floor, ambient * multiplier)
+    logging.info("[STT] Ambient %.0f → VAD threshold %.0f", ambient, threshold)
+    return threshold
@@ -0,0 +1,158 @@
+# agents/spell_index.py (typo tolerance: SymSpell-style symmetric-delete index)
+import argparse
+import json
+import logging
+import os
+import time
+
+
+def _deletes(word, max_distance):
+    """Every string reachable from `word` by up to `max_distance` deletions."""
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def edit_distance(a, b, limit):
+    """Optimal-string-alignment distance, or limit + 1 once it's exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if (prev2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                v = min(v, prev2[j - 2] + 1)
+            cur[j] = v
+            row_min = min(row_min, v)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class SpellIndex:
+    """
+    Symmetric-delete spelling index over the catalog vocabulary.
+    - build: every term's deletes (up to max_distance, on the first
+      prefix_length chars) point back to the term
+    - lookup: the query's deletes are looked up in the same table, so a
+      correction costs a handful of dict hits + short edit distances,
+      independent of vocabulary size
+    - ties break on distance, then term frequency in the catalog
+    - a correction must be confident: the term occurs at least
+      `min_count` times (`far_count` for 2 edits) and holds `min_share`
+      of the counts of all terms at that distance; otherwise the word is
+      left alone ("sister" is not silently turned into "silver")
+    """
+
+    def __init__(self, max_distance=2, prefix_length=7, min_length=4,
+                 min_count=2, far_count=5, min_share=0.6):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.min_length = min_length     # shorter tokens are never corrected
+        self.min_count = min_count
+        self.far_count = far_count
+        self.min_share = min_share
+        self.counts = {}
+        self._deletes = {}
+
+    @classmethod
+    def from_counts(cls, counts, **kwargs):
+        index = cls(**kwargs)
+        for term, count in counts.items():
+            index.add(term, count)
+        logging.info("[SPELL] %s terms, %s delete keys", len(index.counts), len(index._deletes))
+        return index
+
+    def add(self, term, count=1):
+        if term in self.counts:
+            self.counts[term] += count
+            return
+        self.counts[term] = count
+        if len(term) < self.min_length or not term.isalpha():
+            return
+        for d in _deletes(term[:self.prefix_length], self.max_distance):
+            self._deletes.setdefault(d, []).append(term)
+
+    def _limit(self, word):
+        # 1 edit for short words ("kurt" → "kurta"), 2 for longer ones
+        return 1 if len(word) <= 5 else self.max_distance
+
+    def lookup(self, word):
+        """Best vocabulary term for `word` (itself if known / uncorrectable)."""
+        if word in self.counts or len(word) < self.min_length or not word.isalpha():
+            return word
+
+        limit = self._limit(word)
+        best, best_key = None, None
+        seen, at_dist = set(), {}
+        for d in _deletes(word[:self.prefix_length], limit):
+            for term in self._deletes.get(d, ()):
+                if term in seen:
+                    continue
+                seen.add(term)
+                dist = edit_distance(word, term, limit)
+                if dist > limit:
+                    continue
+                at_dist[dist] = at_dist.get(dist, 0) + self.counts[term]
+                key = (dist, -self.counts[term])
+                if best_key is None or key < best_key:
+                    best, best_key = term, key
+        if best is None:
+            return word
+
+        dist, count = best_key[0], -best_key[1]
+        if count < (self.min_count if dist <= 1 else self.far_count):
+            return word
+        if count < self.min_share * at_dist[dist]:
+            return word     # ambiguous: several terms equally close
+        return best
+
+    def correct(self, terms):
+        """
+        Returns (terms, {typo: fix}). A fix is added next to its typo, so
+        the query is OR-ed with the correction instead of replaced.
+        """
+        fixed, changes = [], {}
+        for w in terms:
+            c = self.lookup(w)
+            if c != w:
+                changes[w] = c
+            for t in (w, c):
+                if t not in fixed:
+                    fixed.append(t)
+        return fixed, changes
+
+
+if __name__ == "__main__":
+    # Benchmark: lookup latency on the catalog vocabulary
+    from agents.product_search_agent import ProductSearchAgent
+
+    parser = argparse.ArgumentParser(description="Spell index lookup benchmark")
+    parser.add_argument("words", nargs="*", default=["kurthi", "lehnga", "sherwni", "jaens", "hoddie"])
+    parser.add_argument("--products", default=os.path.join("data", "products.json"))
+    args = parser.parse_args()
+
+    with open(args.products, "r", encoding="utf-8") as f:
+        products = json.load(f)
+    agent = ProductSearchAgent(products)
+
+    for w in args.words:
+        t0 = time.perf_counter()
+        fix = agent.spell.lookup(w)
+        print(f"{w:15s} → {fix:15s} {(time.perf_counter() - t0) * 1e6:8.0f} µs")
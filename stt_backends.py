@@ -0,0 +1,254 @@
+# agents/stt_backends.py (pluggable speech-to-text engines)
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+# Local models are heavy: load each (engine, config) once per process
+_MODELS = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def _load_once(key, loader):
+    with _MODELS_LOCK:
+        if key not in _MODELS:
+            t0 = time.perf_counter()
+            _MODELS[key] = loader()
+            logging.info("[STT] Loaded %s in %.1fs", key, time.perf_counter() - t0)
+        return _MODELS[key]
+
+
+def pcm16(audio, rate=16000):
+    """16 kHz / 16-bit mono PCM bytes from an AudioData-like object."""
+    convert = rate if audio.sample_rate != rate else None
+    return audio.get_raw_data(convert_rate=convert, convert_width=2)
+
+
+class WavAudio:
+    """AudioData-like wrapper around a 16-bit WAV file (batch / benchmarks)."""
+
+    def __init__(self, path):
+        with wave.open(path, "rb") as w:
+            self.sample_rate = w.getframerate()
+            self.sample_width = w.getsampwidth()
+            channels = w.getnchannels()
+            data = w.readframes(w.getnframes())
+        if self.sample_width != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM")
+        x = np.frombuffer(data, dtype=np.int16)
+        if channels > 1:
+            x = x.reshape(-1, channels).mean(axis=1).astype(np.int16)
+        self.samples = x
+        self.duration = len(x) / float(self.sample_rate)
+
+    def get_raw_data(self, convert_rate=None, convert_width=None):
+        x = self.samples
+        if convert_rate and convert_rate != self.sample_rate:
+            n = int(len(x) * convert_rate / self.sample_rate)
+            x = np.interp(
+                np.linspace(0, len(x) - 1, n), np.arange(len(x)), x
+            ).astype(np.int16)
+        return x.tobytes()
+
+    def get_wav_data(self, convert_rate=None, convert_width=None):
+        import io
+        rate = convert_rate or self.sample_rate
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes(self.get_raw_data(convert_rate=convert_rate))
+        return buf.getvalue()
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        raise OSError("FLAC encoding not available for WavAudio")
+
+
+class STTBackend:
+    """
+    Base speech-to-text engine.
+    - transcribe(audio) → text or None; audio is AudioData-like
+    - transcribe_batch(paths) → texts for recorded WAV archives
+    """
+
+    name = "base"
+    local = False
+
+    def transcribe(self, audio):
+        raise NotImplementedError
+
+    def transcribe_batch(self, paths):
+        return [self.transcribe(WavAudio(p)) for p in paths]
+
+
+# ----------------------------------------------------------
+# REMOTE ENGINES
+# ----------------------------------------------------------
+class GroqWhisperBackend(STTBackend):
+    """Groq Whisper API; audio uploaded from memory, 16 kHz FLAC/WAV."""
+
+    name = "groq"
+
+    def __init__(self, client=None, sample_rate=16000, upload_format="flac",
+                 model="whisper-large-v3"):
+        if client is None:
+            from groq import Groq
+            client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self.client = client
+        self.sample_rate = sample_rate
+        self.upload_format = upload_format
+        self.model = model
+
+    def _encode_upload(self, audio):
+        """
+        Returns (filename, bytes) for the STT upload.
+        Captured audio is already mono; it is downsampled to 16 kHz / 16-bit
+        and FLAC-compressed when the encoder is available.
+        """
+        rate = self.sample_rate if audio.sample_rate > self.sample_rate else None
+
+        if self.upload_format == "flac":
+            try:
+                return "audio.flac", audio.get_flac_data(convert_rate=rate, convert_width=2)
+            except Exception:
+                logging.info("[STT] FLAC encoder not available → WAV upload")
+
+        return "audio.wav", audio.get_wav_data(convert_rate=rate, convert_width=2)
+
+    def transcribe(self, audio):
+        name, data = self._encode_upload(audio)
+        resp = self.client.audio.transcriptions.create(file=(name, data), model=self.model)
+        text = getattr(resp, "text", None)
+        return text.strip() if text else None
+
+
+class GoogleBackend(STTBackend):
+    """Google Web Speech via SpeechRecognition."""
+
+    name = "google"
+
+    def transcribe(self, audio):
+        import speech_recognition as sr
+        return sr.Recognizer().recognize_google(audio)
+
+
+# ----------------------------------------------------------
+# LOCAL CPU ENGINES (fully offline, warm model)
+# ----------------------------------------------------------
+class FasterWhisperBackend(STTBackend):
+    """faster-whisper (CTranslate2) on CPU, int8 weights by default."""
+
+    name = "faster-whisper"
+    local = True
+
+    def __init__(self, model_size="base.en", compute_type="int8", language="en",
+                 cpu_threads=0, beam_size=1):
+        from faster_whisper import WhisperModel
+        self.language = language
+        self.beam_size = beam_size
+        self.model = _load_once(
+            ("faster-whisper", model_size, compute_type),
+            lambda: WhisperModel(model_size, device="cpu", compute_type=compute_type,
+                                 cpu_threads=cpu_threads),
+        )
+
+    def _run(self, source):
+        segments, _ = self.model.transcribe(source, language=self.language,
+                                            beam_size=self.beam_size)
+        text = " ".join(s.text.strip() for s in segments).strip()
+        return text or None
+
+    def transcribe(self, audio):
+        x = np.frombuffer(pcm16(audio), dtype=np.int16).astype(np.float32) / 32768.0
+        return self._run(x)
+
+    def transcribe_batch(self, paths):
+        # faster-whisper decodes files itself (any format ffmpeg/av reads)
+        return [self._run(p) for p in paths]
+
+
+class VoskBackend(STTBackend):
+    """Vosk (Kaldi) on CPU; model_path points at an unpacked Vosk model."""
+
+    name = "vosk"
+    local = True
+
+    def __init__(self, model_path=None):
+        import vosk
+        vosk.SetLogLevel(-1)
+        model_path = model_path or os.getenv("VOSK_MODEL_PATH", "models/vosk")
+        self._vosk = vosk
+        self.model = _load_once(("vosk", model_path), lambda: vosk.Model(model_path))
+
+    def transcribe(self, audio):
+        rec = self._vosk.KaldiRecognizer(self.model, 16000)
+        rec.AcceptWaveform(pcm16(audio))
+        text = json.loads(rec.FinalResult()).get("text", "").strip()
+        return text or None
+
+
+BACKENDS = {
+    "groq": GroqWhisperBackend,
+    "google": GoogleBackend,
+    "faster-whisper": FasterWhisperBackend,
+    "vosk": VoskBackend,
+}
+
+
+def make_backend(name, **kwargs):
+    cls = BACKENDS.get(name)
+    if cls is None:
+        raise ValueError(f"Unknown STT backend '{name}' (choose from {sorted(BACKENDS)})")
+    return cls(**kwargs)
+
+
+# ----------------------------------------------------------
+# BENCHMARK: real-time factor per backend
+# ----------------------------------------------------------
+def benchmark(backends, wav_paths, warmup=True):
+    """
+    Returns {backend_name: {"rtf", "audio_s", "cpu_s", "wall_s"}}.
+    RTF = wall time / audio duration (lower is faster; <1 is real-time).
+    """
+    clips = [WavAudio(p) for p in wav_paths]
+    audio_s = sum(c.duration for c in clips)
+    report = {}
+
+    for b in backends:
+        if warmup and clips:
+            b.transcribe(clips[0])
+        t0, c0 = time.perf_counter(), time.process_time()
+        for c in clips:
+            b.transcribe(c)
+        wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+        report[b.name] = {
+            "rtf": round(wall / audio_s, 4) if audio_s else None,
+            "audio_s": round(audio_s, 2),
+            "cpu_s": round(cpu, 3),
+            "wall_s": round(wall, 3),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark STT backends (real-time factor)")
+    parser.add_argument("wavs", nargs="+", help="16-bit WAV clips")
+    parser.add_argument("--backends", default="faster-whisper,vosk",
+                        help="comma-separated: " + ",".join(BACKENDS))
+    args = parser.parse_args()
+
+    engines = []
+    for n in args.backends.split(","):
+        try:
+            engines.append(make_backend(n.strip()))
+        except Exception as e:
+            print(f"skip {n}: {e}")
+
+    for name, r in benchmark(engines, args.wavs).items():
+        print(f"{name:16s} RTF={r['rtf']}  wall={r['wall_s']}s  cpu={r['cpu_s']}s  audio={r['audio_s']}s")
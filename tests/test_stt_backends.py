@@ -0,0 +1,111 @@
+# tests/test_stt_backends.py (STT upload path against a local fake transcription client)
+import builtins
+import math
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sr = pytest.importorskip("speech_recognition")
+
+from agents.speech_agent import SpeechAgent
+from agents.stt_backends import GroqWhisperBackend
+
+
+class FakeTranscriptions:
+    """Records every upload; answers with a fixed transcript."""
+
+    def __init__(self, text):
+        self.text = text
+        self.uploads = []
+
+    def create(self, file, model):
+        self.uploads.append((file, model))
+        return SimpleNamespace(text=self.text)
+
+
+class FakeClient:
+    def __init__(self, text="red kurta under 2000"):
+        self.audio = SimpleNamespace(transcriptions=FakeTranscriptions(text))
+
+
+def tone(seconds, rate, freq=440.0, amp=8000):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amp * np.sin(2 * math.pi * freq * t)).astype(np.int16).tobytes()
+
+
+def flac_streaminfo(data):
+    """(sample rate, channels, bits per sample) from a FLAC STREAMINFO block."""
+    assert data[:4] == b"fLaC"
+    bits = int.from_bytes(data[18:26], "big")
+    return bits >> 44, ((bits >> 41) & 0x7) + 1, ((bits >> 36) & 0x1F) + 1
+
+
+@pytest.fixture
+def no_temp_files(monkeypatch):
+    """Fails the test on any temp file or file opened for writing."""
+    writes = []
+    real_open = builtins.open
+
+    def guarded_open(file, mode="r", *args, **kwargs):
+        if any(m in mode for m in "wax+"):
+            writes.append(file)
+        return real_open(file, mode, *args, **kwargs)
+
+    def refuse(*args, **kwargs):
+        writes.append("tempfile")
+        raise AssertionError("STT upload must not touch temp files")
+
+    monkeypatch.setattr(builtins, "open", guarded_open)
+    for name in ("mkstemp", "mkdtemp", "NamedTemporaryFile", "TemporaryFile"):
+        monkeypatch.setattr(tempfile, name, refuse)
+    return writes
+
+
+def test_upload_is_16k_mono_flac_from_memory(no_temp_files):
+    client = FakeClient()
+    backend = GroqWhisperBackend(client=client)
+
+    audio = sr.AudioData(tone(1.0, 44100), 44100, 2)
+    assert backend.transcribe(audio) == "red kurta under 2000"
+
+    (name, data), model = client.audio.transcriptions.uploads[0]
+    assert name == "audio.flac"
+    assert model == "whisper-large-v3"
+    assert flac_streaminfo(data) == (16000, 1, 16)
+    assert no_temp_files == []
+
+
+def test_speech_agent_round_trips_transcript(no_temp_files):
+    client = FakeClient("  wedding sherwani for men  ")
+    agent = SpeechAgent(client=client)
+
+    audio = sr.AudioData(tone(0.5, 16000), 16000, 2)
+    assert agent.audio_to_text(audio) == "wedding sherwani for men"
+    assert len(client.audio.transcriptions.uploads) == 1
+    assert no_temp_files == []
+
+
+def test_first_utterance_keeps_calibration_frames():
+    rate, chunk_ms = 16000, 30
+    frame = int(rate * chunk_ms / 1000) * 2
+    silence = b"\x00" * int(0.45 * rate) * 2
+    # speech starts in the last 150 ms of the 600 ms calibration window
+    pcm = silence + tone(1.0, rate) + silence * 4
+    frames = [pcm[i:i + frame] for i in range(0, len(pcm), frame)]
+
+    heard = []
+
+    class Backend:
+        name = "fake"
+
+        def transcribe(self, audio):
+            heard.append(np.count_nonzero(np.frombuffer(audio.get_raw_data(), dtype=np.int16)))
+            return "hello"
+
+    agent = SpeechAgent(backend=Backend())
+    agent._vad_threshold = None
+    assert list(agent.iter_transcripts(iter(frames), chunk_ms=chunk_ms)) == ["hello"]
+    # the whole 1 s tone reached STT, not just what followed calibration
+    assert heard[0] >= 0.99 * rate
@@ -0,0 +1,157 @@
+# tracing.py (per-stage latency spans + Prometheus export)
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds (seconds) — BLIP/Gemini/TTS sit at the top end,
+# routing/search/rank at the bottom end.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Trace:
+    """
+    Timings for ONE request.
+    - span(name) is a context manager around an agent call
+    - repeated spans with the same name are summed (e.g. append_ui_log)
+    - timings are kept in milliseconds for the UI payload
+    - wait(name) times the user, not the system (input() / mic capture,
+      blocking prompt TTS): kept apart in `waits` and left out of total
+    """
+
+    def __init__(self, route=None):
+        self.route = route
+        self.timings = {}
+        self.waits = {}
+        self._start = time.perf_counter()
+        self._waited = 0.0
+
+    @contextmanager
+    def span(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            self.timings[name] = round(self.timings.get(name, 0.0) + ms, 3)
+
+    @contextmanager
+    def wait(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            s = time.perf_counter() - t0
+            self._waited += s
+            self.waits[name] = round(self.waits.get(name, 0.0) + s * 1000.0, 3)
+
+    def total_ms(self):
+        return round((time.perf_counter() - self._start - self._waited) * 1000.0, 3)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.sum += seconds
+        self.count += 1
+        for i, le in enumerate(self.buckets):
+            if seconds <= le:
+                self.counts[i] += 1
+                break
+
+
+class Tracer:
+    """
+    Aggregates finished traces into per-(route, stage) histograms.
+    Thread-safe so one tracer can be shared by worker threads.
+    A trace's waits go under route="interaction", never into a route's
+    stages or total.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._hists = {}
+        self._lock = threading.Lock()
+
+    def start(self, route=None):
+        return Trace(route=route)
+
+    def record(self, trace):
+        trace.timings["total"] = trace.total_ms()
+        self.observe(trace.route, trace.timings)
+        if trace.waits:
+            self.observe("interaction", trace.waits)
+
+    def observe(self, route, timings):
+        """Adds one request's {stage: ms} timings (e.g. from a worker process)."""
+        route = route or "unknown"
+        stages = dict(timings)
+
+        with self._lock:
+            for stage, ms in stages.items():
+                key = (route, stage)
+                hist = self._hists.get(key)
+                if hist is None:
+                    hist = self._hists[key] = _Histogram(self.buckets)
+                hist.observe(ms / 1000.0)
+
+        logging.debug("[TRACE] %s %s", route, stages)
+
+    # --------------------------------------------------
+    # Prometheus text exposition format
+    # --------------------------------------------------
+    def render_prometheus(self, name="fashion_stage_latency_seconds"):
+        lines = [
+            f"# HELP {name} Latency of each FashionAssistant stage per route.",
+            f"# TYPE {name} histogram",
+        ]
+
+        with self._lock:
+            items = sorted(self._hists.items())
+            for (route, stage), h in items:
+                labels = f'route="{route}",stage="{stage}"'
+                cumulative = 0
+                for le, c in zip(h.buckets, h.counts):
+                    cumulative += c
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(tracer, port=9100, host="0.0.0.0"):
+    """
+    Server mode: expose GET /metrics on a background thread.
+    Returns the HTTP server so callers can shutdown() it.
+    """
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = tracer.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info("[TRACE] Metrics on http://%s:%s/metrics", host, port)
+    return server
@@ -1,4 +1,6 @@
+import json
 import logging
+import os
 
 class TrendAgent:
     """
@@ -7,6 +9,11 @@ class TrendAgent:
     - Auto-extracts trends from product dataset (viral, trending, popularity)
     - Multi-keyword fuzzy matching
     - Dataset-aware (tags, style, category, occasion)
+    - Mined trend table (trend_miner.py) loaded at startup; GLOBAL stays
+      the fallback for scopes the table doesn't cover
+    - Live popularity: decayed interaction scores pushed in through
+      set_signals() (see popularity_signals.py) replace the static
+      `popularity` field once available
     """
 
     GLOBAL = {
@@ -39,8 +46,32 @@ class TrendAgent:
         "west": ["denim jacket", "kurti", "pastel tees"],
     }
 
-    def __init__(self, products=None):
+    def __init__(self, products=None, table_path=None):
         self.products = products or []
+        self.trends = dict(self.GLOBAL)
+        self.table_version = None
+        if table_path:
+            self.load_table(table_path)
+        self.signals = {}           # id → 0–1 live popularity
+        self.region_signals = {}    # region → {id → 0–1}
+
+    def load_table(self, path):
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+            self.trends = {**self.GLOBAL, **table.get("trends", {})}
+            self.table_version = table.get("version")
+            logging.info(f"[TREND] Loaded trend table v{self.table_version} "
+                         f"({len(table.get('trends', {}))} scopes)")
+        except Exception:
+            logging.exception("[TREND] Bad trend table → built-in trends")
+
+    def set_signals(self, signals, region_signals=None):
+        # swapped as whole dicts → readers never see a half-built table
+        self.signals = signals or {}
+        self.region_signals = region_signals or {}
 
     # --------------------------------------------------
     # INTERNAL: Extract searchable blob from product
@@ -96,27 +127,30 @@ class TrendAgent:
         # --------------------------------------------------
         # 1) Region-based trends
         # --------------------------------------------------
-        if region in self.GLOBAL:
-            trend_keywords += self.GLOBAL[region]
+        if region in self.trends:
+            trend_keywords += self.trends[region]
 
         # metros share similar streetwear/modern trends
         if region == "metro":
-            trend_keywords += self.GLOBAL.get("metro", [])
+            trend_keywords += self.trends.get("metro", [])
 
         # --------------------------------------------------
         # 2) Event-based trends
         # --------------------------------------------------
-        if event in self.GLOBAL:
-            trend_keywords += self.GLOBAL[event]
+        if event in self.trends:
+            trend_keywords += self.trends[event]
 
         # --------------------------------------------------
         # 3) Always include global viral trends
         # --------------------------------------------------
-        trend_keywords += self.GLOBAL.get("viral", [])
+        trend_keywords += self.trends.get("viral", [])
 
         # --------------------------------------------------
         # 4) Score matching products
         # --------------------------------------------------
+        signals = self.signals
+        local = self.region_signals.get(region, {})
+
         scored = []
         for p in self.products:
             s = self._multi_match(p, trend_keywords)
@@ -126,9 +160,12 @@ class TrendAgent:
             if "trending" in tags or "viral" in tags:
                 s += 2
 
-            # Popularity boost
-            popularity = p.get("popularity", 0)
-            if popularity > 85:
+            # Popularity boost: live interaction signal when we have one,
+            # else the static catalog field
+            if signals:
+                pid = p.get("id")
+                s += 4 * signals.get(pid, 0.0) + 2 * local.get(pid, 0.0)
+            elif p.get("popularity", 0) > 85:
                 s += 2
 
             # Rating boost
@@ -0,0 +1,272 @@
+# trend_miner.py (offline job: mine rising trend phrases → versioned trend table)
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import combinations
+
+from event_log import log_files, read_segment
+from agents.event_agent import EVENT_MAP, FUZZY_KEYWORD_MAP
+from agents.query_analyzer import ANALYZER
+from agents.region_agent import RegionAgent
+
+TAGS = {"INPUT", "OUTPUT", "CLICK", "PURCHASE"}
+WEIGHTS = {"OUTPUT": 1, "CLICK": 5, "PURCHASE": 20}
+
+
+class MisraGries:
+    """
+    Heavy-hitter summary in O(k) memory.
+    - counts are under-estimates by at most `error`
+    - update() folds in a whole Counter of (weighted) counts; when more
+      than 2k keys are held, every count drops by the (k+1)-th largest
+      (batched decrement), so a click of weight 5 is one +5, not five +1
+    - summaries merge exactly like updates, so chunks / workers can be
+      mined independently and combined
+    """
+
+    def __init__(self, k=2000):
+        self.k = k
+        self.counts = Counter()
+        self.error = 0
+
+    def update(self, counter):
+        self.counts.update(counter)
+        if len(self.counts) > 2 * self.k:
+            self._reduce()
+
+    def merge(self, other):
+        self.update(other.counts)
+        self.error += other.error
+
+    def _reduce(self):
+        cut = heapq.nlargest(self.k + 1, self.counts.values())[-1]
+        self.counts = Counter({key: c - cut for key, c in self.counts.items() if c > cut})
+        self.error += cut
+
+    def top(self, n):
+        return self.counts.most_common(n)
+
+
+def _scope_maps():
+    """Single words → region bucket / event name (phrases are matched as bigrams)."""
+    regions = {}
+    for region, words in RegionAgent.REGION_MAP.items():
+        for w in words:
+            if len(w) > 2:   # "up", "mp", "tn" are too ambiguous in free text
+                regions.setdefault(w, region)
+    for w, city in RegionAgent.FUZZY.items():
+        for region, words in RegionAgent.REGION_MAP.items():
+            if city in words:
+                regions.setdefault(w, region)
+                break
+    events = {e: e for e in EVENT_MAP}
+    events.update(FUZZY_KEYWORD_MAP)
+    return regions, events
+
+
+def product_pairs(products):
+    """product id → tag co-occurrence phrases ("oversized hoodie", "ethnic kurta"…)."""
+    regions, _ = _scope_maps()
+    pairs = {}
+    for p in products:
+        words = sorted({t.lower() for t in (p.get("tags") or [])}
+                       | {(p.get("category") or "").lower(), (p.get("style") or "").lower()}
+                       - {""} - set(regions))
+        pairs[p.get("id")] = [f"{a} {b}" for a, b in combinations(words, 2)]
+    return pairs
+
+
+class _Miner:
+    """
+    Counts phrases per (scope, window) for a stream of events.
+    Phrases are tallied per chunk (weighted events as (phrase, weight)
+    pairs, never repeated) into one weighted Counter per scope-window,
+    folded into its MisraGries with a single batched update().
+    """
+
+    def __init__(self, pairs, window_s, windows, now, k, chunk=1000000):
+        self.window_s = window_s
+        self.first = int(now // window_s) - windows + 1
+        self.k = k
+        self.chunk = chunk
+        self.regions, self.events = _scope_maps()
+        self.pairs = pairs
+
+        self.summaries = {}
+        self._pending = {}      # (scope, win) → phrases of weight 1
+        self._weighted = {}     # (scope, win) → (phrase, weight) pairs
+        self._n = 0
+
+    def _scopes(self, words, region):
+        scopes = ["viral"]
+        region = region or next((self.regions[w] for w in words if w in self.regions), None)
+        if region:
+            scopes.append(region)
+        ev = next((self.events[w] for w in words if w in self.events), None)
+        if ev:
+            scopes.append(ev)
+        return scopes
+
+    def feed(self, e):
+        win = int(e.get("ts", 0) // self.window_s)
+        if win < self.first:
+            return
+
+        tag = e.get("tag")
+        if tag == "INPUT":
+            raw = ANALYZER.tokens(e.get("msg"))
+            terms = ANALYZER.analyze(e.get("msg"))
+            grams = terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]
+            weight = 1
+        else:
+            raw = []
+            ids = e.get("ids") if tag == "OUTPUT" else [e.get("id")]
+            grams = [g for pid in ids or [] for g in self.pairs.get(pid, ())]
+            weight = WEIGHTS.get(tag, 1)
+        if not grams:
+            return
+
+        # raw phrase lists; Counter() tallies them in C at flush time
+        if weight > 1:
+            grams = [(g, weight) for g in grams]
+        for scope in self._scopes(raw, (e.get("region") or "").lower() or None):
+            pending = self._weighted if weight > 1 else self._pending
+            pending.setdefault((scope, win), []).extend(grams)
+            self._n += len(grams)
+        if self._n >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        for key in self._pending.keys() | self._weighted.keys():
+            counts = Counter(self._pending.get(key, ()))
+            for gram, weight in self._weighted.get(key, ()):
+                counts[gram] += weight
+            self.summaries.setdefault(key, MisraGries(self.k)).update(counts)
+        self._pending = {}
+        self._weighted = {}
+        self._n = 0
+
+
+_PAIRS = {}
+
+
+def _init_worker(pairs):
+    # the pair table is shipped once per worker, not once per file
+    global _PAIRS
+    _PAIRS = pairs
+
+
+def _mine_file(args):
+    path, window_s, windows, now, k = args
+    miner = _Miner(_PAIRS, window_s, windows, now, k)
+    for e in read_segment(path, start=miner.first * window_s, tags=TAGS):
+        miner.feed(e)
+    miner.flush()
+    return miner.summaries
+
+
+def rising(summaries, window_s, windows, now, top_n=8, smoothing=5.0):
+    """
+    Per scope: phrases ranked by count in the newest window × log-lift
+    over the mean of the previous windows. Only rising phrases are kept.
+    """
+    cur = int(now // window_s)
+    table = {}
+    for scope in sorted({s for s, _ in summaries}):
+        latest = summaries.get((scope, cur)) or summaries.get((scope, cur - 1))
+        if latest is None:
+            continue
+        hist = [summaries[(scope, w)] for w in range(cur - windows + 1, cur)
+                if (scope, w) in summaries and summaries[(scope, w)] is not latest]
+
+        scored = []
+        for phrase, c in latest.top(latest.k):
+            prev = sum(h.counts.get(phrase, 0) for h in hist) / max(1, len(hist))
+            lift = math.log((c + smoothing) / (prev + smoothing))
+            if not hist or lift > 0:
+                scored.append((c * (lift if hist else 1.0), phrase))
+        scored.sort(reverse=True)
+        if scored:
+            table[scope] = [phrase for _, phrase in scored[:top_n]]
+    return table
+
+
+def mine(log_path, products, window_s=7 * 86400, windows=4, k=2000, top_n=8,
+         workers=1, now=None):
+    """Trend table {scope: [phrases]} from ui_logs (+ rotated segments)."""
+    now = now or time.time()
+    files = log_files(log_path, start=(int(now // window_s) - windows + 1) * window_s)
+    pairs = product_pairs(products)
+    jobs = [(p, window_s, windows, now, k) for p in files]
+
+    merged = {}
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(pairs,)) as pool:
+            parts = list(pool.map(_mine_file, jobs))
+    else:
+        _init_worker(pairs)
+        parts = [_mine_file(j) for j in jobs]
+    for part in parts:
+        for key, mg in part.items():
+            if key in merged:
+                merged[key].merge(mg)
+            else:
+                merged[key] = mg
+
+    logging.info("[TREND_MINER] %s files, %s scope-windows", len(files), len(merged))
+    return rising(merged, window_s, windows, now, top_n=top_n)
+
+
+def write_table(trends, out_dir, window_s):
+    """Writes v<N>.json and atomically points current.json at it."""
+    os.makedirs(out_dir, exist_ok=True)
+    versions = [int(f[1:-5]) for f in os.listdir(out_dir)
+                if f.startswith("v") and f.endswith(".json") and f[1:-5].isdigit()]
+    version = max(versions, default=0) + 1
+    table = {
+        "version": version,
+        "created": datetime.utcnow().isoformat() + "Z",
+        "window_s": window_s,
+        "trends": trends,
+    }
+    data = json.dumps(table, ensure_ascii=False, indent=2)
+    with open(os.path.join(out_dir, f"v{version}.json"), "w", encoding="utf-8") as f:
+        f.write(data)
+    tmp = os.path.join(out_dir, "current.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, os.path.join(out_dir, "current.json"))
+    return version
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Mine rising trend phrases from ui_logs")
+    parser.add_argument("--log", default=os.path.join("data", "ui_logs.jsonl"))
+    parser.add_argument("--products", default=os.path.join("data", "products.json"))
+    parser.add_argument("--out", default=os.path.join("data", "trends"))
+    parser.add_argument("--window-days", type=float, default=7)
+    parser.add_argument("--windows", type=int, default=4,
+                        help="newest window + this many minus one for the baseline")
+    parser.add_argument("--k", type=int, default=2000, help="heavy hitters kept per scope/window")
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with open(args.products, "r", encoding="utf-8") as f:
+        catalog = json.load(f)
+
+    window = int(args.window_days * 86400)
+    t0 = time.time()
+    trends = mine(args.log, catalog, window_s=window, windows=args.windows, k=args.k,
+                  top_n=args.top, workers=args.workers)
+    v = write_table(trends, args.out, window)
+    print(f"Trend table v{v}: {len(trends)} scopes in {time.time() - t0:.1f}s → {args.out}")
@@ -0,0 +1,150 @@
+# ui_writer.py (buffered, non-blocking UI log + output writer)
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+
+from event_log import make_event
+
+# Output modes
+#   single : legacy — one data/ui_output.json, last payload wins
+#   keyed  : one <request_id>.json per request under an output directory
+#   jsonl  : every payload appended to one JSON-lines stream
+OUTPUT_MODES = ("single", "keyed", "jsonl")
+
+_STOP = object()
+
+
+class UIWriter:
+    """
+    Background writer for ui_logs / ui_output.
+    - callers only enqueue (bounded queue), the writer thread does the I/O
+    - log lines become structured events, batched into one EventLog write
+      per wake-up
+    - payloads are serialized compactly on the caller thread (snapshot)
+    - flush() waits for everything queued so far; close() runs at exit
+    """
+
+    def __init__(self, event_log, output_path, output_mode="single", output_dir=None,
+                 max_queue=10000, batch_size=512, flush_interval=0.25):
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"output_mode must be one of {OUTPUT_MODES}")
+
+        self.event_log = event_log
+        self.output_path = output_path
+        self.output_mode = output_mode
+        self.output_dir = output_dir or os.path.splitext(output_path)[0]
+        self.jsonl_path = os.path.splitext(output_path)[0] + ".jsonl"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.pid = os.getpid()
+
+        if output_mode == "keyed":
+            os.makedirs(self.output_dir, exist_ok=True)
+
+        self._q = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="ui-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --------------------------------------------------
+    # Producer side
+    # --------------------------------------------------
+    def log(self, line, **fields):
+        # timestamped here, not when the writer thread gets to it
+        self._put(("log", make_event(line, **fields)))
+
+    def output(self, payload):
+        key = payload.get("request_id") or uuid.uuid4().hex
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        self._put(("out", (key, data)))
+
+    def _put(self, item):
+        if self._closed:
+            return
+        try:
+            # brief back-pressure, then shed load instead of stalling a request
+            self._q.put(item, timeout=0.05)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logging.warning("[UI_WRITER] Queue full — dropped %s items", self.dropped)
+
+    def flush(self):
+        self._q.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(_STOP)
+        self._thread.join(timeout=10)
+
+    # --------------------------------------------------
+    # Writer thread
+    # --------------------------------------------------
+    def _loop(self):
+        jsonl_f = None
+        running = True
+
+        while running:
+            try:
+                batch = [self._q.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+
+            events = []
+            outputs = []
+            for item in batch:
+                if item is _STOP:
+                    running = False
+                    continue
+                kind, data = item
+                if kind == "log":
+                    events.append(data)
+                else:
+                    outputs.append(data)
+
+            try:
+                if events:
+                    self.event_log.write(events)
+
+                if outputs:
+                    if self.output_mode == "jsonl":
+                        if jsonl_f is None:
+                            jsonl_f = open(self.jsonl_path, "a", encoding="utf-8")
+                        jsonl_f.write("".join(d + "\n" for _, d in outputs))
+                        jsonl_f.flush()
+                    elif self.output_mode == "keyed":
+                        for key, d in outputs:
+                            self._replace(os.path.join(self.output_dir, f"{key}.json"), d)
+                    else:
+                        # single file: only the newest payload survives anyway
+                        self._replace(self.output_path, outputs[-1][1])
+            except Exception:
+                logging.exception("[UI_WRITER] Failed to write UI batch")
+            finally:
+                for _ in batch:
+                    self._q.task_done()
+
+        self.event_log.close()
+        if jsonl_f:
+            jsonl_f.close()
+
+    @staticmethod
+    def _replace(path, data):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, path)
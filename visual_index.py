@@ -0,0 +1,241 @@
+# agents/visual_index.py (image → product retrieval: BLIP vision embeddings + product quantization)
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+DEFAULT_MODEL = "Salesforce/blip-image-captioning-base"
+
+
+def _kmeans(x, k, iters=15, seed=0):
+    """Euclidean k-means for one PQ subspace."""
+    rng = np.random.default_rng(seed)
+    cent = x[rng.choice(len(x), size=k, replace=False)].copy()
+    x_sq = (x * x).sum(axis=1)[:, None]
+    for _ in range(iters):
+        d = x_sq - 2 * x @ cent.T + (cent * cent).sum(axis=1)[None, :]
+        assign = np.argmin(d, axis=1)
+        for c in range(k):
+            members = x[assign == c]
+            if len(members):
+                cent[c] = members.mean(axis=0)
+    return cent
+
+
+class VisualIndex:
+    """
+    Product-image embeddings compressed with product quantization (PQ).
+    - each L2-normalized embedding is cut into `m` sub-vectors; each is
+      stored as the id of its nearest of `ks` centroids → m bytes/product
+    - a query is scored against all codes with one (m, ks) table of
+      query·centroid products, then a gather + sum (asymmetric distance)
+    - add() encodes new / re-embedded products with the existing
+      codebooks; below `train_size` vectors they are kept raw and searched
+      exactly, after that the codebooks are trained once and everything
+      is encoded
+    - `paths` records the image each product was embedded from, so
+      rebuilds only embed new or changed images
+    """
+
+    def __init__(self, dim, m=16, ks=256, train_size=4096, model_name=DEFAULT_MODEL):
+        if dim % m:
+            raise ValueError(f"dim {dim} is not divisible by m={m}")
+        if ks > 256:
+            raise ValueError("codes are uint8: ks must be <= 256")
+        self.dim = dim
+        self.m = m
+        self.ks = ks
+        self.train_size = train_size
+        self.model_name = model_name
+
+        self.ids = []
+        self.paths = []
+        self._row = {}
+        self.codebooks = None                              # (m, ks, dim/m)
+        self.codes = np.zeros((0, m), dtype=np.uint8)
+        self.raw = np.zeros((0, dim), dtype=np.float32)    # until trained
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def path_of(self, pid):
+        row = self._row.get(pid)
+        return self.paths[row] if row is not None else None
+
+    # --------------------------------------------------
+    # PQ
+    # --------------------------------------------------
+    def _split(self, x):
+        return x.reshape(len(x), self.m, self.dim // self.m)
+
+    def train(self, x):
+        ks = min(self.ks, len(x))
+        sub = self._split(x)
+        self.codebooks = np.stack([_kmeans(sub[:, j], ks, seed=j) for j in range(self.m)])
+        self.ks = ks
+        logging.info("[VISUAL] Trained %s×%s codebooks on %s vectors", self.m, ks, len(x))
+
+    def encode(self, x):
+        sub = self._split(x)
+        codes = np.empty((len(x), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            cb = self.codebooks[j]
+            d = (cb * cb).sum(axis=1)[None, :] - 2 * sub[:, j] @ cb.T
+            codes[:, j] = np.argmin(d, axis=1)
+        return codes
+
+    # --------------------------------------------------
+    # Incremental build
+    # --------------------------------------------------
+    def add(self, ids, vectors, paths=None):
+        """Adds products, or replaces the vectors of ids already indexed."""
+        if not len(ids):
+            return
+        x = np.asarray(vectors, dtype=np.float32)
+        x = x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+        paths = list(paths) if paths is not None else [None] * len(ids)
+
+        rows = self.encode(x) if self.trained else x
+        store = "codes" if self.trained else "raw"
+        table = getattr(self, store)
+
+        new = []
+        for i, pid in enumerate(ids):
+            row = self._row.get(pid)
+            if row is None:
+                new.append(i)
+                continue
+            table[row] = rows[i]
+            self.paths[row] = paths[i]
+        if new:
+            for i in new:
+                self._row[ids[i]] = len(self.ids)
+                self.ids.append(ids[i])
+                self.paths.append(paths[i])
+            table = np.concatenate([table, rows[new]])
+        setattr(self, store, table)
+
+        if not self.trained and len(self.raw) >= self.train_size:
+            self.train(self.raw)
+            self.codes = self.encode(self.raw)
+            self.raw = np.zeros((0, self.dim), dtype=np.float32)
+
+    # --------------------------------------------------
+    # Query
+    # --------------------------------------------------
+    def search(self, query, k=20):
+        """Product ids of the `k` most similar images, best first."""
+        if not len(self.ids):
+            return []
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        if self.trained:
+            table = np.einsum("jd,jcd->jc", self._split(q[None, :])[0], self.codebooks)
+            sims = table[np.arange(self.m)[None, :], self.codes].sum(axis=1)
+        else:
+            sims = self.raw @ q
+
+        k = min(k, len(sims))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [self.ids[i] for i in top]
+
+    # --------------------------------------------------
+    # Persistence
+    # --------------------------------------------------
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        if self.trained:
+            np.save(os.path.join(path, "codebooks.npy"), self.codebooks)
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        np.save(os.path.join(path, "raw.npy"), self.raw)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "model": self.model_name,
+                "dim": self.dim,
+                "m": self.m,
+                "ks": self.ks,
+                "train_size": self.train_size,
+                "ids": self.ids,
+                "paths": self.paths,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], m=meta["m"], ks=meta["ks"], train_size=meta["train_size"],
+                    model_name=meta["model"])
+        cb = os.path.join(path, "codebooks.npy")
+        if os.path.exists(cb):
+            index.codebooks = np.load(cb)
+        index.codes = np.load(os.path.join(path, "codes.npy"))
+        index.raw = np.load(os.path.join(path, "raw.npy"))
+        index.ids = meta["ids"]
+        index.paths = meta["paths"]
+        index._row = {pid: i for i, pid in enumerate(index.ids)}
+        return index
+
+
+def _local_image(path, base):
+    """Catalog image_path → readable local file (URLs are skipped)."""
+    if not path or "://" in path:
+        return None
+    for p in (path, os.path.join(base, path)):
+        if os.path.isfile(p):
+            return p
+    return None
+
+
+if __name__ == "__main__":
+    from agents.facebody_agent import FaceBodyAgent
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(
+        description="Build / extend the product image index (only new or changed images are embedded)")
+    parser.add_argument("--products", default=os.path.join("data", "products.json"))
+    parser.add_argument("--out", default=os.path.join("data", "visual_index"))
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--m", type=int, default=16, help="PQ sub-vectors (bytes per product)")
+    parser.add_argument("--train-size", type=int, default=4096)
+    args = parser.parse_args()
+
+    with open(args.products, "r", encoding="utf-8") as f:
+        products = json.load(f)
+    base = os.path.dirname(os.path.abspath(args.products))
+
+    index = VisualIndex.load(args.out) if os.path.exists(os.path.join(args.out, "meta.json")) else None
+    todo, skipped = [], 0
+    for p in products:
+        pid, img = p.get("id"), p.get("image_path")
+        if pid is None or not img or (index is not None and index.path_of(pid) == img):
+            continue
+        local = _local_image(img, base)
+        if local is None:
+            skipped += 1
+            continue
+        todo.append((pid, img, local))
+
+    agent = FaceBodyAgent()
+    t0 = time.time()
+    for start in range(0, len(todo), args.batch_size):
+        batch = todo[start:start + args.batch_size]
+        vectors = agent.embed_images([local for _, _, local in batch])
+        if vectors is None:
+            raise SystemExit("BLIP vision model not available")
+        if index is None:
+            index = VisualIndex(vectors.shape[1], m=args.m, train_size=args.train_size)
+        index.add([pid for pid, _, _ in batch], vectors, [img for _, img, _ in batch])
+
+    if index is not None:
+        index.save(args.out)
+    print(f"Embedded {len(todo)} new/changed images in {time.time() - t0:.1f}s "
+          f"({skipped} skipped, {len(index) if index else 0} indexed) → {args.out}")
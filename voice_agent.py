@@ -1,28 +1,88 @@
 # agents/voice_agent.py
+import hashlib
 import logging
 import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# SAPI SpeakFlags
+SVSF_ASYNC = 1
+SVSF_PURGE_BEFORE_SPEAK = 2
+
+# Fixed prompts the assistant says on (almost) every session — pre-rendered
+COMMON_PROMPTS = [
+    "Hello! Ask me for outfits, or say 'upload image' to try-on.",
+    "Please enter your image path.",
+    "Image uploaded successfully! What would you like to know?",
+    "Sorry, I couldn't find a recommendation.",
+    "Goodbye!",
+]
+
 
 class VoiceAgent:
     """
     Multi-mode Voice Agent
     - main_assistant.py → normal voice output (SAPI / pyttsx3)
     - live.py (Streamlit) → returns audio file for playback
+      (one warm engine owned by a "tts-file" render thread that every
+      synthesis goes through, content-hashed LRU cache of rendered audio)
+    - background=True → engine lives on a dedicated speech thread;
+      speak_async() queues text and returns a Future, cancel() interrupts
+    - mode="print" forces the print stand-in (tests)
     """
 
-    def __init__(self, debug=False, voice_name=None, streamlit_mode=False):
+    def __init__(self, debug=False, voice_name=None, streamlit_mode=False,
+                 cache_dir="tts_cache", cache_size=256, prerender=True,
+                 background=False, mode=None, lease_s=120):
         self.debug = debug
         self.streamlit_mode = streamlit_mode   # <--- IMPORTANT
         self.engine = None
         self.mode = "none"
+        self.voice_name = voice_name
+
+        self._worker = None
+        self._queue = queue.Queue()
+        self._cancel = threading.Event()
 
         # --------------------------
         # STREAMLIT MODE (file-only)
         # --------------------------
         if self.streamlit_mode:
             self.mode = "file"
+            self.cache_dir = cache_dir
+            self.cache_size = cache_size
+            self._cache = OrderedDict()          # key → path, oldest first
+            self._leases = {}                    # key → monotonic time its path may be evicted
+            self.lease_s = lease_s               # a returned path outlives its playback
+            self._lock = threading.Lock()        # cache only; the engine is render-thread-bound
+            self._load_cache()
+            self._render_queue = queue.Queue()
+            self._renderer = threading.Thread(target=self._render_loop, name="tts-file", daemon=True)
+            self._renderer.start()
             logging.info("[TTS] Streamlit file-output mode enabled")
+
+            if prerender:
+                self.prerender(COMMON_PROMPTS)
+            if background:
+                self._start_worker(init_engine=False)
             return
 
+        if mode == "print":
+            self.mode = "print"
+        elif background:
+            # SAPI/pyttsx3 engines are COM/thread-bound: create them on the
+            # thread that will speak
+            self._start_worker(init_engine=True)
+        else:
+            self._init_engine()
+
+    def _init_engine(self):
+        voice_name = self.voice_name
+
         # --------------------------
         # WINDOWS SAPI MODE
         # --------------------------
@@ -55,6 +115,9 @@ class VoiceAgent:
                         e.setProperty("voice", v.id)
                         break
 
+            # lets cancel() stop an utterance between words
+            e.connect("started-word", self._on_word)
+
             self.engine = e
             self.mode = "pyttsx3"
             logging.info("[TTS] Using pyttsx3 engine")
@@ -68,11 +131,229 @@ class VoiceAgent:
         self.engine = None
         self.mode = "print"
 
+    def _on_word(self, name, location, length):
+        if self._cancel.is_set():
+            self.engine.stop()
+
+    # ------------------------------------------------
+    # BACKGROUND SPEECH QUEUE
+    # ------------------------------------------------
+    def _start_worker(self, init_engine):
+        ready = threading.Event()
+        self._worker = threading.Thread(
+            target=self._worker_loop, args=(init_engine, ready), name="tts", daemon=True
+        )
+        self._worker.start()
+        ready.wait(timeout=10)
+
+    def _worker_loop(self, init_engine, ready):
+        if init_engine:
+            try:
+                import pythoncom
+                pythoncom.CoInitialize()
+            except Exception:
+                pass
+            self._init_engine()
+        ready.set()
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            text, fut = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            self._cancel.clear()
+            try:
+                fut.set_result(self._speak_now(text))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def speak_async(self, text):
+        """Queues `text`; returns a Future (audio path in file mode, else None)."""
+        fut = Future()
+        if not text:
+            fut.set_result(None)
+            return fut
+        if self._worker is None:
+            self._start_worker(init_engine=False)
+        self._queue.put((text, fut))
+        return fut
+
+    def cancel(self):
+        """Drops queued utterances and interrupts the current one."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].cancel()
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        """Blocks until everything queued so far has been spoken."""
+        if self._worker is None:
+            return
+        self.speak_async(" ").result(timeout=timeout)
+
+    def close(self):
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join(timeout=5)
+            self._worker = None
+        if self.mode == "file" and self._renderer is not None:
+            self._render_queue.put(None)
+            self._renderer.join(timeout=5)
+            self._renderer = None
+
+    # ------------------------------------------------
+    # FILE MODE: synthesized-audio cache
+    # ------------------------------------------------
+    def _cache_key(self, text):
+        raw = f"{self.voice_name or ''}|{text.strip()}".encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()
+
+    def _load_cache(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp.wav"):
+                # left behind by a render that crashed mid-write
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            elif name.endswith(".wav"):
+                files.append((os.path.getmtime(path), name[:-4], path))
+        for _, key, path in sorted(files):
+            self._cache[key] = path
+        self._evict()
+
+    def _evict(self):
+        # oldest first, skipping paths handed out within lease_s: a caller
+        # may not have played them yet
+        now = time.monotonic()
+        self._leases = {k: t for k, t in self._leases.items() if t > now}
+        over = len(self._cache) - self.cache_size
+        for key in list(self._cache):
+            if over <= 0:
+                break
+            if key in self._leases:
+                continue
+            path = self._cache.pop(key)
+            over -= 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _lease(self, key):
+        # caller holds self._lock
+        self._leases[key] = time.monotonic() + self.lease_s
+
+    def _cached(self, key):
+        with self._lock:
+            path = self._cache.get(key)
+            if path and os.path.exists(path):
+                self._cache.move_to_end(key)
+                self._lease(key)
+                return path
+        return None
+
+    def _file_engine(self):
+        # only ever called on the render thread (pyttsx3/SAPI are thread-bound)
+        if self.engine is None:
+            try:
+                import pythoncom
+                pythoncom.CoInitialize()
+            except Exception:
+                pass
+            import pyttsx3
+            e = pyttsx3.init()
+            if self.voice_name:
+                for v in e.getProperty("voices"):
+                    if self.voice_name.lower() in v.name.lower():
+                        e.setProperty("voice", v.id)
+                        break
+            self.engine = e
+        return self.engine
+
+    def _render_loop(self):
+        while True:
+            item = self._render_queue.get()
+            if item is None:
+                return
+            text, fut = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(self._render(text))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def _render(self, text):
+        key = self._cache_key(text)
+        path = self._cached(key)          # queued twice / pre-rendered meanwhile
+        if path:
+            return path
+
+        path = os.path.join(self.cache_dir, key + ".wav")
+        tmp = os.path.join(self.cache_dir, f"{key}.{uuid.uuid4().hex}.tmp.wav")
+        engine = self._file_engine()
+        engine.save_to_file(text, tmp)
+        engine.runAndWait()
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._cache[key] = path
+            self._lease(key)
+            self._evict()
+        return path
+
+    def _render_async(self, text):
+        fut = Future()
+        self._render_queue.put((text, fut))
+        return fut
+
+    def synthesize(self, text):
+        """Path of the rendered WAV for `text` (cached by content hash)."""
+        path = self._cached(self._cache_key(text))
+        if path:
+            return path
+        return self._render_async(text).result()
+
+    def synthesize_bytes(self, text):
+        """In-memory WAV bytes for `text` (e.g. st.audio(data))."""
+        with open(self.synthesize(text), "rb") as f:
+            return f.read()
+
+    def prerender(self, texts):
+        """Queues `texts` on the render thread; doesn't wait for them."""
+        def done(fut, t):
+            if not fut.cancelled() and fut.exception() is not None:
+                logging.info("[TTS] Pre-render skipped: %s", t)
+
+        for t in texts:
+            if not self._cached(self._cache_key(t)):
+                self._render_async(t).add_done_callback(lambda f, t=t: done(f, t))
+
 
     def speak(self, text):
         if not text:
             return None
 
+        # keep ordering with anything already queued
+        if self._worker is not None:
+            return self.speak_async(text).result()
+
+        return self._speak_now(text)
+
+    def _speak_now(self, text):
+        if not text.strip():
+            return None
+
         logging.info(f"[TTS] Speak mode: {self.mode}")
 
         # ------------------------------------------------
@@ -80,12 +361,7 @@ class VoiceAgent:
         # ------------------------------------------------
         if self.mode == "file":
             try:
-                import pyttsx3
-                engine = pyttsx3.init()
-                outfile = "tts_output.wav"
-                engine.save_to_file(text, outfile)
-                engine.runAndWait()
-                return outfile      # <--- RETURN PATH FOR STREAMLIT
+                return self.synthesize(text)      # <--- RETURN PATH FOR STREAMLIT
             except Exception:
                 logging.exception("[TTS] File TTS failed → printing")
                 print("[AI]:", text)
@@ -96,7 +372,11 @@ class VoiceAgent:
         # ------------------------------------------------
         if self.mode == "sapi" and self.engine:
             try:
-                self.engine.Speak(text)
+                self.engine.Speak(text, SVSF_ASYNC)
+                while not self.engine.WaitUntilDone(50):
+                    if self._cancel.is_set():
+                        self.engine.Speak("", SVSF_ASYNC | SVSF_PURGE_BEFORE_SPEAK)
+                        break
                 return None
             except Exception:
                 logging.exception("[TTS] SAPI failed → fallback to pyttsx3")
@@ -0,0 +1,97 @@
+# worker_pool.py (multi-core serving with a shared read-only catalog)
+import gc
+import logging
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from tracing import Tracer
+
+# The assistant every worker answers with. With fork it is built ONCE in the
+# parent and inherited copy-on-write; with spawn each worker builds its own.
+_SHARED = None
+
+
+def _init_worker(load_vision, build):
+    global _SHARED
+    # agents log every step at INFO — too noisy for N workers
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if build or _SHARED is None:
+        from main_assistant import FashionAssistantSingleShot
+        _SHARED = FashionAssistantSingleShot(hybrid=False, headless=True, load_vision=load_vision)
+    elif load_vision:
+        # Only vision workers ever pay for BLIP (lazy property)
+        _ = _SHARED.facebody
+
+
+def _answer(text, image_path=None, user_id=None):
+    return _SHARED.handle_query(text, image_path=image_path, user_id=user_id)
+
+
+class AssistantPool:
+    """
+    Process-pool execution for FashionAssistantSingleShot.
+    - catalog + search/rank/trend indexes are loaded once in the parent
+    - workers are forked AFTER the load and share those pages copy-on-write
+      (gc.freeze keeps the collector from touching — and copying — them)
+    - text routes go to `text_workers` processes, image queries to a small
+      dedicated vision pool, the only processes that load BLIP
+    - falls back to spawn (per-worker load) where fork is unavailable
+    """
+
+    def __init__(self, text_workers=None, vision_workers=1, tracer=None):
+        global _SHARED
+
+        self.tracer = tracer or Tracer()
+        self.text_workers = text_workers or os.cpu_count() or 1
+        self.vision_workers = vision_workers
+
+        fork = "fork" in mp.get_all_start_methods()
+        ctx = mp.get_context("fork" if fork else "spawn")
+
+        if fork:
+            from main_assistant import FashionAssistantSingleShot
+            _SHARED = FashionAssistantSingleShot(hybrid=False, headless=True, load_vision=False)
+            gc.freeze()
+        else:
+            logging.info("[POOL] fork unavailable — each worker loads the catalog")
+
+        self.text_pool = ProcessPoolExecutor(
+            max_workers=self.text_workers, mp_context=ctx,
+            initializer=_init_worker, initargs=(False, not fork)
+        )
+        self.vision_pool = ProcessPoolExecutor(
+            max_workers=self.vision_workers, mp_context=ctx,
+            initializer=_init_worker, initargs=(True, not fork)
+        ) if self.vision_workers else None
+
+        logging.info("[POOL] %s text workers, %s vision workers (%s)",
+                     self.text_workers, self.vision_workers, ctx.get_start_method())
+
+    def submit(self, text, image_path=None, user_id=None):
+        """Dispatches one query; returns a Future of its UI payload."""
+        # only image queries need BLIP; text routed to "vision" has nothing to analyze
+        pool = self.vision_pool if image_path and self.vision_pool else self.text_pool
+
+        fut = pool.submit(_answer, text, image_path, user_id)
+        fut.add_done_callback(self._observe)
+        return fut
+
+    def _observe(self, fut):
+        if fut.cancelled() or fut.exception():
+            return
+        payload = fut.result()
+        self.tracer.observe(payload.get("route"), payload.get("timings") or {})
+
+    def shutdown(self, wait=True):
+        self.text_pool.shutdown(wait=wait)
+        if self.vision_pool:
+            self.vision_pool.shutdown(wait=wait)
+        gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()